@@ -1,28 +1,65 @@
 import os
 import shutil
+import time
 import uuid # Import modul uuid
-from flask import Flask, request, jsonify, send_from_directory # Import Flask dan komponennya
+from collections.abc import Mapping
+from flask import Flask, request, jsonify, send_file, g # Import Flask dan komponennya
 
 # Import modul-modul yang sudah ada
-from database import initialize_database, DATABASE_NAME, get_user_name_by_id # Import fungsi baru
-from key import generate_key_pair, save_key_pair, get_private_key_content, get_public_key
+from database import initialize_database, DATABASE_NAME
+from logger import begin_request, end_request, flush_logs, get_logger, is_forked_child, log_stage
+from key import generate_key_pair, save_key_pair, get_private_key_content, get_public_key, get_key_algorithm, SUPPORTED_ALGORITHMS, DEFAULT_ALGORITHM
 # Import fungsi generate_qr_code_for_doc_info yang baru dari generate.py
-from generate import sign_document, verify_signature, save_document_info, get_document_info, STORAGE_DIR, calculate_file_hash, generate_qr_code_for_doc_info
+from scrubber import start_scrubber_thread
+from storage import write_stored_file, open_stored_file, sharded_path
+from jobs import enqueue_signing_job, get_signing_job, start_job_workers, JOB_DONE, JOB_FAILED
+from generate import sign_document, sign_document_hash, verify_signature, verify_document_hash, save_document_info, get_document_info, get_document_info_with_signer, list_documents, STORAGE_DIR, calculate_file_hash, generate_qr_code_for_doc_info
 
 app = Flask(__name__) # Inisialisasi aplikasi Flask
+logger = get_logger(__name__)
 
 # --- Konfigurasi URL Dasar untuk QR Code ---
 # Penting: Ganti ini dengan URL publik API Anda jika di-deploy ke server lain
 BASE_API_URL = "http://localhost:5000" 
 # --- Akhir Konfigurasi ---
 
+# --- Konfigurasi Kompresi Storage ---
+# Codec untuk mengompresi file baru di STORAGE_DIR: None (tanpa kompresi), 'gzip', 'lzma', atau 'zlib'.
+# File yang tidak menjadi lebih kecil setelah dikompresi tetap disimpan apa adanya.
+# File lama bisa dikonversi dengan: python storage.py compress gzip
+STORAGE_CODEC = None
+# --- Akhir Konfigurasi Kompresi ---
+
+# --- Konfigurasi Scrubber Integritas ---
+# Jika True, scrubber berjalan di thread background dan memeriksa ulang file di STORAGE_DIR secara berkala.
+# Alternatifnya, jalankan sebagai proses terpisah: python scrubber.py --loop
+SCRUBBER_ENABLED = False
+SCRUBBER_IO_BUDGET_MB_S = 5.0 # Batas laju baca file agar tidak bersaing dengan trafik API
+SCRUBBER_CONCURRENCY = 2
+# --- Akhir Konfigurasi Scrubber ---
+
+# --- Konfigurasi Penandatanganan Asinkron ---
+# Worker memproses job dari /upload_and_sign dengan async=true secara micro-batch.
+# Jika False, jalankan worker sebagai proses terpisah: python jobs.py
+ASYNC_SIGNING_WORKERS_ENABLED = True
+ASYNC_SIGNING_WORKERS = 2
+# --- Akhir Konfigurasi Asinkron ---
+
 # --- Inisialisasi Awal Aplikasi ---
+def is_reloader_parent():
+    """
+    True jika modul ini dijalankan sebagai proses induk reloader werkzeug (python app.py dengan debug=True).
+    Proses induk hanya memantau perubahan file; request dilayani oleh proses anak (WERKZEUG_RUN_MAIN=true),
+    sehingga worker dan scrubber tidak perlu (dan tidak boleh ikut) berjalan di proses induk.
+    """
+    return __name__ == "__main__" and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+
 # Fungsi ini akan dipanggil sekali saat aplikasi dimulai
 def setup_application():
     """
     Melakukan setup awal aplikasi: inisialisasi database dan generate kunci default.
     """
-    print("Memulai setup aplikasi...")
+    logger.info("Memulai setup aplikasi...")
     initialize_database()
 
     # Generate kunci untuk pengguna default jika belum ada
@@ -30,23 +67,82 @@ def setup_application():
     # Cek apakah kunci privat untuk user ini sudah ada di file
     # (get_private_key_content akan mengembalikan None jika path tidak ada atau file tidak ada)
     if not get_private_key_content(default_user_id):
-        print(f"Kunci untuk user '{default_user_id}' tidak ditemukan. Menghasilkan dan menyimpan...")
+        logger.info("Kunci untuk user '%s' tidak ditemukan. Menghasilkan dan menyimpan...", default_user_id)
         # generate_key_pair sekarang akan menyimpan kunci privat ke file
         private_key_path, public_key_pem = generate_key_pair(default_user_id)
         if private_key_path and public_key_pem:
             # save_key_pair sekarang menyimpan path kunci privat
             save_key_pair(default_user_id, private_key_path, public_key_pem)
-            print(f"Kunci untuk '{default_user_id}' berhasil dibuat.")
+            logger.info("Kunci untuk '%s' berhasil dibuat.", default_user_id)
         else:
-            print(f"Gagal menghasilkan kunci untuk '{default_user_id}'.")
+            logger.error("Gagal menghasilkan kunci untuk '%s'.", default_user_id)
     else:
-        print(f"Kunci untuk user '{default_user_id}' sudah ada.")
-    print("Setup aplikasi selesai.")
+        logger.info("Kunci untuk user '%s' sudah ada.", default_user_id)
+
+    if is_reloader_parent():
+        logger.info("Proses induk reloader: worker dan scrubber background tidak dijalankan di proses ini.")
+    elif ASYNC_SIGNING_WORKERS_ENABLED:
+        start_job_workers(ASYNC_SIGNING_WORKERS)
+        logger.info("%d worker penandatanganan asinkron berjalan di background.", ASYNC_SIGNING_WORKERS)
+
+    if SCRUBBER_ENABLED and not is_reloader_parent():
+        start_scrubber_thread(io_budget_mb_s=SCRUBBER_IO_BUDGET_MB_S, concurrency=SCRUBBER_CONCURRENCY)
+        logger.info("Scrubber integritas berjalan di background.")
+    logger.info("Setup aplikasi selesai.")
 
 # Panggil setup aplikasi saat startup
 with app.app_context():
     setup_application()
 
+def ensure_user_key(user_id, algorithm=DEFAULT_ALGORITHM):
+    """
+    Membuat pasangan kunci untuk user_id jika belum ada.
+    Returns:
+        str: Pesan error jika gagal, atau None jika kunci sudah tersedia.
+    """
+    if get_private_key_content(user_id):
+        return None
+    logger.info("Kunci untuk user '%s' tidak ditemukan. Mencoba membuat kunci baru (%s)...", user_id, algorithm)
+    with log_stage('keygen', logger, algorithm=algorithm):
+        private_key_path, public_key_pem = generate_key_pair(user_id, algorithm)
+    if not (private_key_path and public_key_pem):
+        return f"Gagal menghasilkan kunci baru untuk user '{user_id}'."
+    if not save_key_pair(user_id, private_key_path, public_key_pem, algorithm):
+        return f"Gagal menyimpan kunci baru untuk user '{user_id}'."
+    logger.info("Kunci baru untuk '%s' berhasil dibuat dan disimpan.", user_id)
+    return None
+
+# --- Log per request ---
+# Setiap request mendapat ID (dari header X-Request-ID jika dikirim klien) yang ikut tercatat di semua
+# baris log selama request berjalan. Saat request selesai, satu baris log merangkum status dan durasi per tahap.
+@app.before_request
+def start_request_log():
+    g.request_id, g.request_log_token = begin_request(request.headers.get('X-Request-ID'))
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def add_request_id_header(response):
+    response.headers['X-Request-ID'] = g.request_id
+    g.response_status = response.status_code
+    if is_forked_child():
+        # Proses anak werkzeug (processes>1) keluar lewat os._exit() setelah satu request, tanpa atexit.
+        # Tunggu listener menulis log request ini setelah respons terkirim, sebelum proses anak berakhir.
+        response.call_on_close(flush_logs)
+    return response
+
+@app.teardown_request
+def finish_request_log(exc):
+    token = g.pop('request_log_token', None)
+    if token is None:
+        return
+    duration_ms = round((time.perf_counter() - g.request_start) * 1000, 3)
+    status = 500 if exc else g.get('response_status')
+    logger.info("%s %s %s", request.method, request.path, status, extra={
+        'request_id': g.request_id, 'method': request.method, 'path': request.path, 'status': status,
+        'duration_ms': duration_ms, 'stages': end_request(token)
+    }, exc_info=exc)
+# --- Akhir log per request ---
+
 # --- Routes API ---
 
 @app.route('/', methods=['GET'])
@@ -61,6 +157,10 @@ def api_upload_document_and_sign():
     """
     API Endpoint: Menerima file untuk diunggah, ditandatangani, dan disimpan.
     Menerima file, user_id, dan publisher_name melalui form-data.
+    Parameter opsional 'algorithm' (rsa-pss, ed25519, ecdsa-p256) menentukan algoritma kunci
+    saat kunci pengguna pertama kali dibuat. Pengguna yang sudah memiliki kunci tetap memakai algoritmanya.
+    Jika 'async' bernilai true, file hanya disimpan lalu respons 202 dikembalikan dengan job_id;
+    penandatanganan dilakukan oleh worker dan hasilnya dapat diambil di /signing_job/<job_id>.
     """
     if 'file' not in request.files:
         return jsonify({"status": "error", "message": "Tidak ada bagian 'file' dalam permintaan."}), 400
@@ -69,6 +169,10 @@ def api_upload_document_and_sign():
     user_id = request.form.get('user_id') # Mengambil user_id dari form-data
     # Mengambil publisher_name dari form-data, dengan default 'PT. Signature Dokumen'
     publisher_name = request.form.get('publisher_name', 'PT. Signature Dokumen') 
+    # Mengambil algoritma kunci dari form-data, dengan default RSA-PSS
+    algorithm = request.form.get('algorithm', DEFAULT_ALGORITHM)
+    # Mode asinkron: penandatanganan dilakukan oleh worker di background
+    async_mode = request.form.get('async', 'false').lower() in ('1', 'true', 'yes')
 
     if file.filename == '':
         return jsonify({"status": "error", "message": "Tidak ada file yang dipilih."}), 400
@@ -76,17 +180,15 @@ def api_upload_document_and_sign():
     if not user_id: # Memastikan user_id disediakan
         return jsonify({"status": "error", "message": "Parameter 'user_id' harus disediakan dalam form-data."}), 400
 
+    if algorithm not in SUPPORTED_ALGORITHMS:
+        return jsonify({"status": "error", "message": f"Parameter 'algorithm' harus salah satu dari: {', '.join(SUPPORTED_ALGORITHMS)}."}), 400
+
     # --- Tambahkan kondisi untuk membuat kunci jika user_id belum memiliki kunci ---
-    if not get_private_key_content(user_id):
-        print(f"Kunci untuk user '{user_id}' tidak ditemukan. Mencoba membuat kunci baru...")
-        private_key_path, public_key_pem = generate_key_pair(user_id)
-        if private_key_path and public_key_pem:
-            if save_key_pair(user_id, private_key_path, public_key_pem):
-                print(f"Kunci baru untuk '{user_id}' berhasil dibuat dan disimpan.")
-            else:
-                return jsonify({"status": "error", "message": f"Gagal menyimpan kunci baru untuk user '{user_id}'."}), 500
-        else:
-            return jsonify({"status": "error", "message": f"Gagal menghasilkan kunci baru untuk user '{user_id}'."}), 500
+    # (pada mode asinkron kunci dibuat oleh worker)
+    if not async_mode:
+        key_error = ensure_user_key(user_id, algorithm)
+        if key_error:
+            return jsonify({"status": "error", "message": key_error}), 500
     # --- Akhir dari kondisi penambahan kunci ---
 
 
@@ -94,45 +196,65 @@ def api_upload_document_and_sign():
         original_filename = file.filename # Simpan nama file asli
         # Buat nama file unik untuk penyimpanan di server
         stored_filename = f"{uuid.uuid4()}_{original_filename}"
-        file_data = file.read() # Baca konten file dalam bentuk bytes
 
-        print(f"\n[API] Menerima dokumen '{original_filename}' untuk ditandatangani oleh '{user_id}'...")
+        logger.debug("Menerima dokumen '%s' untuk ditandatangani oleh '%s'...", original_filename, user_id)
 
-        # 1. Simpan file asli ke storage dengan nama unik
-        file_path = os.path.join(STORAGE_DIR, stored_filename)
+        # 1. Simpan file asli ke storage dengan nama unik (dikompresi secara streaming jika STORAGE_CODEC diset)
+        # File ditempatkan di subdirektori fan-out, misal uploaded_files/3f/a2/<uuid>_<nama>
         try:
-            with open(file_path, 'wb') as f:
-                f.write(file_data)
-            print(f"File '{original_filename}' berhasil disimpan di '{file_path}'.")
+            with log_stage('store_file', logger):
+                file_path, storage_codec = write_stored_file(file.stream, sharded_path(STORAGE_DIR, stored_filename), STORAGE_CODEC)
+            logger.debug("File '%s' berhasil disimpan di '%s' (codec: %s).", original_filename, file_path, storage_codec)
         except Exception as e:
             return jsonify({"status": "error", "message": f"Gagal menyimpan file: {e}"}), 500
 
-        # 2. Tandatangani dokumen (menggunakan path ke nama file unik)
-        signature_hex, doc_hash = sign_document(file_path, user_id)
+        if async_mode:
+            job_id = enqueue_signing_job(user_id, original_filename, stored_filename, file_path, storage_codec, publisher_name, algorithm)
+            if not job_id:
+                os.remove(file_path)
+                return jsonify({"status": "error", "message": "Gagal menambahkan job penandatanganan ke antrian."}), 500
+            return jsonify({
+                "status": "accepted",
+                "message": "Dokumen diterima dan akan ditandatangani di background.",
+                "job_id": job_id,
+                "status_url": f"{BASE_API_URL}/signing_job/{job_id}",
+                "original_filename": original_filename,
+                "stored_filename": stored_filename,
+                "signer_user_id": user_id,
+                "publisher_name": publisher_name
+            }), 202 # 202 Accepted
+
+        # 2. Tandatangani dokumen (hash dihitung atas isi asli file, bukan hasil kompresi)
+        signature_hex, doc_hash = sign_document(file_path, user_id, storage_codec)
         if not signature_hex:
             os.remove(file_path) # Hapus file jika gagal tanda tangan
             return jsonify({"status": "error", "message": "Gagal menandatangani dokumen. Pastikan user_id valid dan kunci tersedia."}), 500
 
-        # 3. Ambil kunci publik penanda tangan
+        # 3. Ambil kunci publik dan algoritma kunci penanda tangan
         public_key_signer = get_public_key(user_id)
         if not public_key_signer:
             os.remove(file_path)
             return jsonify({"status": "error", "message": "Kunci publik penanda tangan tidak ditemukan."}), 500
+        signature_algorithm = get_key_algorithm(user_id) or DEFAULT_ALGORITHM
 
         # 4. Simpan informasi tanda tangan ke database
         # Mengirimkan nama file unik, nama file asli, dan publisher_name
-        doc_id = save_document_info(
-            stored_filename, original_filename, file_path, doc_hash,
-            public_key_signer, signature_hex, user_id, publisher_name # Menambahkan publisher_name
-        )
+        with log_stage('save_document', logger):
+            doc_id = save_document_info(
+                stored_filename, original_filename, file_path, doc_hash,
+                public_key_signer, signature_hex, user_id, publisher_name, # Menambahkan publisher_name
+                signature_algorithm, # Algoritma dicatat per dokumen agar verifikasi memakai algoritma yang benar
+                storage_codec
+            )
         if not doc_id:
             os.remove(file_path)
             return jsonify({"status": "error", "message": "Gagal menyimpan informasi tanda tangan ke database."}), 500
         
         # --- 5. Hasilkan QR Code untuk info dokumen ---
-        qr_code_base64 = generate_qr_code_for_doc_info(doc_id, BASE_API_URL)
+        with log_stage('qrcode', logger):
+            qr_code_base64 = generate_qr_code_for_doc_info(doc_id, BASE_API_URL)
         if not qr_code_base64:
-            print(f"Peringatan: Gagal menghasilkan QR code untuk dokumen ID {doc_id}.")
+            logger.warning("Gagal menghasilkan QR code untuk dokumen ID %s.", doc_id)
             # Lanjutkan proses meskipun QR code gagal dibuat, tapi berikan pesan peringatan
         # --- Akhir penambahan QR Code ---
 
@@ -144,6 +266,7 @@ def api_upload_document_and_sign():
             "stored_filename": stored_filename,     # Mengembalikan nama file unik di storage
             "document_hash": doc_hash,
             "signature": signature_hex,
+            "signature_algorithm": signature_algorithm,
             "signer_user_id": user_id,
             "publisher_name": publisher_name, # Mengembalikan publisher_name
             "qr_code_image_base64": qr_code_base64 # Menambahkan QR code Base64 ke respons
@@ -152,16 +275,107 @@ def api_upload_document_and_sign():
     return jsonify({"status": "error", "message": "Permintaan tidak valid."}), 400
 
 
+@app.route('/sign_digest', methods=['POST'])
+def api_sign_digest():
+    """
+    API Endpoint: Menandatangani digest SHA256 dokumen tanpa mengunggah isi file.
+    Menerima JSON atau form-data dengan 'digest' (hex SHA256, 64 karakter), 'user_id',
+    serta opsional 'original_filename', 'publisher_name', 'file_size', dan 'algorithm'.
+    Tanda tangan dibuat dengan parameter yang sama seperti /upload_and_sign, dan dokumen
+    dicatat sebagai digest-only (file asli tidak disimpan di server).
+    """
+    data = request.get_json(silent=True) or request.form
+    if not isinstance(data, Mapping):
+        return jsonify({"status": "error", "message": "Body JSON harus berupa objek."}), 400
+    for field in ('digest', 'user_id', 'original_filename', 'publisher_name', 'algorithm'):
+        if data.get(field) is not None and not isinstance(data.get(field), str):
+            return jsonify({"status": "error", "message": f"Parameter '{field}' harus berupa string."}), 400
+
+    digest = (data.get('digest') or '').strip().lower()
+    user_id = data.get('user_id')
+    original_filename = data.get('original_filename') or 'digest-only'
+    publisher_name = data.get('publisher_name', 'PT. Signature Dokumen')
+    algorithm = data.get('algorithm', DEFAULT_ALGORITHM)
+    file_size = data.get('file_size')
+
+    if len(digest) != 64 or any(c not in '0123456789abcdef' for c in digest):
+        return jsonify({"status": "error", "message": "Parameter 'digest' harus berupa hash SHA256 dalam format heksadesimal (64 karakter)."}), 400
+
+    if not user_id:
+        return jsonify({"status": "error", "message": "Parameter 'user_id' harus disediakan."}), 400
+
+    if algorithm not in SUPPORTED_ALGORITHMS:
+        return jsonify({"status": "error", "message": f"Parameter 'algorithm' harus salah satu dari: {', '.join(SUPPORTED_ALGORITHMS)}."}), 400
+
+    if file_size is not None:
+        # Form-data mengirim string; JSON harus berupa integer (bukan float atau boolean)
+        # isdigit() juga menerima digit non-ASCII (misal '²') yang tidak bisa diubah oleh int()
+        if isinstance(file_size, str) and file_size.strip().isascii() and file_size.strip().isdigit():
+            file_size = int(file_size)
+        if isinstance(file_size, bool) or not isinstance(file_size, int) or file_size < 0:
+            return jsonify({"status": "error", "message": "Parameter 'file_size' harus berupa bilangan bulat tidak negatif."}), 400
+
+    key_error = ensure_user_key(user_id, algorithm)
+    if key_error:
+        return jsonify({"status": "error", "message": key_error}), 500
+
+    logger.debug("Menerima digest untuk '%s' untuk ditandatangani oleh '%s'...", original_filename, user_id)
+
+    signature_hex = sign_document_hash(digest, user_id)
+    if not signature_hex:
+        return jsonify({"status": "error", "message": "Gagal menandatangani digest. Pastikan user_id valid dan kunci tersedia."}), 500
+
+    public_key_signer = get_public_key(user_id)
+    if not public_key_signer:
+        return jsonify({"status": "error", "message": "Kunci publik penanda tangan tidak ditemukan."}), 500
+    signature_algorithm = get_key_algorithm(user_id) or DEFAULT_ALGORITHM
+
+    # Nama unik tetap dibuat agar dokumen bisa dicari dengan parameter 'filename'; path file dikosongkan
+    stored_filename = f"{uuid.uuid4()}_{original_filename}"
+    with log_stage('save_document', logger):
+        doc_id = save_document_info(
+            stored_filename, original_filename, '', digest,
+            public_key_signer, signature_hex, user_id, publisher_name,
+            signature_algorithm, None, digest_only=True, file_size=file_size
+        )
+    if not doc_id:
+        return jsonify({"status": "error", "message": "Gagal menyimpan informasi tanda tangan ke database."}), 500
+
+    with log_stage('qrcode', logger):
+        qr_code_base64 = generate_qr_code_for_doc_info(doc_id, BASE_API_URL)
+    if not qr_code_base64:
+        logger.warning("Gagal menghasilkan QR code untuk dokumen ID %s.", doc_id)
+
+    return jsonify({
+        "status": "success",
+        "message": "Digest dokumen berhasil ditandatangani.",
+        "document_id": doc_id,
+        "original_filename": original_filename,
+        "stored_filename": stored_filename,
+        "document_hash": digest,
+        "file_size": file_size,
+        "digest_only": True,
+        "signature": signature_hex,
+        "signature_algorithm": signature_algorithm,
+        "signer_user_id": user_id,
+        "publisher_name": publisher_name,
+        "qr_code_image_base64": qr_code_base64
+    }), 201 # 201 Created
+
+
 @app.route('/download_original_file/<int:document_id>', methods=['GET'])
 def api_download_original_file(document_id):
     """
     API Endpoint: Mengunduh file asli berdasarkan ID dokumen.
     """
-    print(f"\n[API] Permintaan unduh file asli untuk dokumen ID: {document_id}...")
+    logger.debug("Permintaan unduh file asli untuk dokumen ID: %s...", document_id)
     doc_info = get_document_info(doc_id=document_id)
     if not doc_info:
         return jsonify({"status": "error", "message": f"Dokumen dengan ID {document_id} tidak ditemukan."}), 404
 
+    if doc_info['digest_only']:
+        return jsonify({"status": "error", "message": f"Dokumen dengan ID {document_id} ditandatangani dari digest saja, file asli tidak disimpan di server."}), 404
+
     # Menggunakan original_file_path yang berisi nama file unik di storage
     file_path_on_storage = doc_info['original_file_path']
     # Menggunakan original_filename untuk nama file saat diunduh
@@ -171,9 +385,13 @@ def api_download_original_file(document_id):
         return jsonify({"status": "error", "message": f"File asli tidak ditemukan di path: {file_path_on_storage}"}), 404
 
     try:
-        # send_from_directory digunakan untuk mengirim file dengan benar
         # Menggunakan download_filename sebagai nama file yang akan diterima oleh klien
-        return send_from_directory(STORAGE_DIR, os.path.basename(file_path_on_storage), as_attachment=True, download_name=download_filename)
+        if not doc_info['storage_codec']:
+            # File tidak terkompresi dikirim berdasarkan path agar Content-Length, ETag, Last-Modified,
+            # dan range request tetap didukung (path absolut: send_file menganggap path relatif dari root aplikasi)
+            return send_file(os.path.abspath(file_path_on_storage), as_attachment=True, download_name=download_filename, conditional=True)
+        # File terkompresi dikirim sebagai stream isi asli (didekompresi on-the-fly)
+        return send_file(open_stored_file(file_path_on_storage, doc_info['storage_codec']), as_attachment=True, download_name=download_filename)
     except Exception as e:
         return jsonify({"status": "error", "message": f"Error saat mengunduh file: {e}"}), 500
 
@@ -192,21 +410,30 @@ def api_get_digital_signature_info():
     if not document_id and not filename_on_storage:
         return jsonify({"status": "error", "message": "Harap berikan 'document_id' atau 'filename' (nama file unik di storage)."}), 400
 
-    print(f"\n[API] Permintaan info tanda tangan digital untuk ID: {document_id} / Nama Unik: {filename_on_storage}...")
-    doc_info = get_document_info(doc_id=document_id, filename=filename_on_storage)
+    logger.debug("Permintaan info tanda tangan digital untuk ID: %s / Nama Unik: %s...", document_id, filename_on_storage)
+    # Informasi dokumen dan nama lengkap penanda tangan diambil dalam satu query
+    with log_stage('lookup', logger):
+        doc_info = get_document_info_with_signer(doc_id=document_id, filename=filename_on_storage)
     if not doc_info:
         return jsonify({"status": "error", "message": "Dokumen tidak ditemukan."}), 404
 
     # Lakukan verifikasi
-    is_valid = verify_signature(
-        doc_info['original_file_path'], # Ini akan merujuk ke path dengan nama unik
-        doc_info['public_key'],
-        doc_info['signature']
-    )
-
-    # --- Ambil nama lengkap penanda tangan dari tabel user_profiles ---
-    signer_fullname = get_user_name_by_id(doc_info['signer_user_id'])
-    # --- Akhir penambahan ---
+    if doc_info['digest_only']:
+        # File asli tidak disimpan; verifikasi tanda tangan atas digest yang tercatat
+        is_valid = verify_document_hash(
+            doc_info['document_hash'],
+            doc_info['public_key'],
+            doc_info['signature'],
+            doc_info['signature_algorithm']
+        )
+    else:
+        is_valid = verify_signature(
+            doc_info['original_file_path'], # Ini akan merujuk ke path dengan nama unik
+            doc_info['public_key'],
+            doc_info['signature'],
+            doc_info['signature_algorithm'],
+            doc_info['storage_codec']
+        )
 
     return jsonify({
         "status": "success",
@@ -217,14 +444,72 @@ def api_get_digital_signature_info():
         "document_hash_stored": doc_info['document_hash'],
         "public_key_used": doc_info['public_key'],
         "signature_stored": doc_info['signature'],
+        "signature_algorithm": doc_info['signature_algorithm'],
+        "digest_only": bool(doc_info['digest_only']),
+        "file_size": doc_info['file_size'],
         "signer_user_id": doc_info['signer_user_id'],
-        "signer_fullname": signer_fullname, # Menambahkan nama lengkap penanda tangan
+        "signer_fullname": doc_info['signer_fullname'], # Menambahkan nama lengkap penanda tangan
         "publisher_name": doc_info['publisher_name'], # Mengembalikan publisher_name
         "timestamp": doc_info['timestamp'],
+        "integrity_status": doc_info['integrity_status'], # Hasil pemeriksaan terakhir scrubber
+        "last_verified_at": doc_info['last_verified_at'],
         "verification_status": "VALID" if is_valid else "INVALID",
         "verification_message": "Tanda tangan digital valid, integritas dokumen terjaga." if is_valid else "Tanda tangan digital tidak valid atau dokumen telah diubah."
     }), 200
 
+@app.route('/documents', methods=['GET'])
+def api_list_documents():
+    """
+    API Endpoint: Mengambil daftar dokumen terbaru (dari semua partisi database dokumen).
+    Query parameter opsional: signer_user_id dan limit (default 100, maksimal 1000).
+    Contoh: /documents?signer_user_id=user123&limit=20
+    """
+    signer_user_id = request.args.get('signer_user_id')
+    limit = request.args.get('limit', default=100, type=int)
+    if limit < 1 or limit > 1000:
+        return jsonify({"status": "error", "message": "'limit' harus antara 1 dan 1000."}), 400
+
+    documents = list_documents(signer_user_id=signer_user_id, limit=limit)
+    for doc in documents:
+        doc['digest_only'] = bool(doc['digest_only'])
+    return jsonify({
+        "status": "success",
+        "count": len(documents),
+        "documents": documents
+    }), 200
+
+@app.route('/signing_job/<job_id>', methods=['GET'])
+def api_get_signing_job(job_id):
+    """
+    API Endpoint: Mengambil status job penandatanganan asinkron.
+    Jika job selesai, respons berisi document_id, signature, dan QR code (Base64).
+    """
+    job = get_signing_job(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": f"Job dengan ID {job_id} tidak ditemukan."}), 404
+
+    response = {
+        "status": "success",
+        "job_id": job['job_id'],
+        "job_status": job['status'],
+        "original_filename": job['original_filename'],
+        "stored_filename": job['stored_filename'],
+        "signer_user_id": job['user_id'],
+        "publisher_name": job['publisher_name'],
+        "created_at": job['created_at'],
+        "updated_at": job['updated_at']
+    }
+    if job['status'] == JOB_DONE:
+        response.update({
+            "document_id": job['document_id'],
+            "document_hash": job['document_hash'],
+            "signature": job['signature'],
+            "qr_code_image_base64": generate_qr_code_for_doc_info(job['document_id'], BASE_API_URL)
+        })
+    elif job['status'] == JOB_FAILED:
+        response["error"] = job['error']
+    return jsonify(response), 200
+
 # --- API Baru: Mendapatkan QR Code untuk Info Dokumen ---
 @app.route('/get_qrcode/<int:document_id>', methods=['GET'])
 def api_get_qrcode_for_doc_info(document_id):
@@ -235,7 +520,7 @@ def api_get_qrcode_for_doc_info(document_id):
     Returns:
         dict: Respons JSON dengan gambar QR code Base64 atau pesan error.
     """
-    print(f"\n[API] Permintaan QR code untuk dokumen ID: {document_id}...")
+    logger.debug("Permintaan QR code untuk dokumen ID: %s...", document_id)
     
     # Cek apakah dokumen ada
     doc_info = get_document_info(doc_id=document_id)
@@ -0,0 +1,56 @@
+import argparse
+import hashlib
+import os
+import time
+
+from key import create_private_key, SUPPORTED_ALGORITHMS
+from generate import sign_digest, verify_digest
+
+def _measure(func, iterations):
+    """
+    Menjalankan func sebanyak iterations kali dan mengembalikan jumlah operasi per detik.
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed if elapsed > 0 else float('inf')
+
+def benchmark_algorithm(algorithm, keygen_iterations=20, sign_iterations=500):
+    """
+    Mengukur throughput pembuatan kunci, tanda tangan, dan verifikasi untuk satu algoritma.
+    Tanda tangan dibuat atas hash SHA256 seperti pada sign_document.
+    Returns:
+        dict: Operasi per detik untuk 'keygen', 'sign', dan 'verify', serta ukuran tanda tangan.
+    """
+    hashed_data = hashlib.sha256(os.urandom(4096)).digest()
+
+    keygen_ops = _measure(lambda: create_private_key(algorithm), keygen_iterations)
+
+    private_key = create_private_key(algorithm)
+    public_key = private_key.public_key()
+    sign_ops = _measure(lambda: sign_digest(private_key, hashed_data, algorithm), sign_iterations)
+
+    signature = sign_digest(private_key, hashed_data, algorithm)
+    verify_ops = _measure(lambda: verify_digest(public_key, signature, hashed_data, algorithm), sign_iterations)
+
+    return {
+        "keygen": keygen_ops,
+        "sign": sign_ops,
+        "verify": verify_ops,
+        "signature_bytes": len(signature),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark algoritma tanda tangan (keygen, sign, verify).")
+    parser.add_argument("--keygen-iterations", type=int, default=20, help="Jumlah pembuatan kunci per algoritma.")
+    parser.add_argument("--sign-iterations", type=int, default=500, help="Jumlah tanda tangan/verifikasi per algoritma.")
+    parser.add_argument("--algorithm", choices=SUPPORTED_ALGORITHMS, action="append",
+                        help="Algoritma yang diuji (bisa diulang). Default: semua algoritma.")
+    args = parser.parse_args()
+
+    algorithms = args.algorithm or SUPPORTED_ALGORITHMS
+    print(f"{'Algoritma':<12} {'keygen/s':>12} {'sign/s':>12} {'verify/s':>12} {'sig bytes':>10}")
+    for algorithm in algorithms:
+        result = benchmark_algorithm(algorithm, args.keygen_iterations, args.sign_iterations)
+        print(f"{algorithm:<12} {result['keygen']:>12.1f} {result['sign']:>12.1f} {result['verify']:>12.1f} {result['signature_bytes']:>10}")
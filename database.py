@@ -1,8 +1,77 @@
 import sqlite3
 import os
+import threading
+import time
+
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 DATABASE_NAME = 'digital_signature.db'
 
+# --- Konfigurasi cache profil pengguna ---
+# Nama di user_profiles hampir tidak pernah berubah, jadi hasil lookup disimpan di memori
+# selama USER_PROFILE_CACHE_TTL detik. Cache dihapus secara eksplisit saat profil diperbarui.
+USER_PROFILE_CACHE_TTL = 300
+_user_profile_cache = {} # user_id -> (name, waktu_kedaluwarsa)
+_user_profile_cache_lock = threading.Lock()
+# Dinaikkan setiap kali cache dihapus, agar hasil query yang dimulai sebelum penghapusan tidak ikut disimpan
+_user_profile_cache_generation = 0
+# --- Akhir konfigurasi cache ---
+
+def _add_column_if_missing(cursor, table, column, definition):
+    """
+    Menambahkan kolom ke tabel yang sudah ada (untuk database yang dibuat oleh versi sebelumnya).
+    """
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing_columns = [row[1] for row in cursor.fetchall()]
+    if column not in existing_columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        logger.info("Kolom '%s' ditambahkan ke tabel '%s'.", column, table)
+
+def create_documents_table(cursor):
+    """
+    Membuat tabel documents (beserta index dan kolom tambahan untuk database lama) pada koneksi cursor.
+    Dipakai untuk database utama maupun file partisi dokumen.
+    """
+    # Tabel untuk menyimpan informasi dokumen dan tanda tangan
+    # Menambahkan kolom 'signer_user_id' untuk merelasikan dokumen dengan pengguna yang menandatangani
+    # Menambahkan kolom 'original_filename' untuk menyimpan nama file asli dari user
+    # Menambahkan kolom 'publisher_name' untuk nama perusahaan/penerbit tanda tangan
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,            -- Ini akan menjadi nama file unik yang disimpan di storage
+            original_filename TEXT NOT NULL,   -- Nama file asli yang diunggah oleh pengguna
+            original_file_path TEXT NOT NULL,  -- Path ke file asli di storage (akan menggunakan 'filename' unik)
+            document_hash TEXT NOT NULL,       -- Hash dari dokumen asli (misal: SHA256)
+            public_key TEXT NOT NULL,          -- Kunci publik yang digunakan untuk verifikasi
+            signature TEXT NOT NULL,           -- Tanda tangan digital
+            signer_user_id TEXT NOT NULL,      -- ID pengguna yang menandatangani dokumen
+            publisher_name TEXT,               -- Nama perusahaan/penerbit tanda tangan (opsional, bisa NULL)
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            signature_algorithm TEXT NOT NULL DEFAULT 'rsa-pss', -- Algoritma yang dipakai untuk tanda tangan ini
+            last_verified_at DATETIME,         -- Waktu terakhir file diperiksa oleh scrubber (NULL jika belum pernah)
+            integrity_status TEXT,             -- Hasil pemeriksaan terakhir scrubber (OK, MISSING, HASH_MISMATCH, ...)
+            storage_codec TEXT,                -- Codec kompresi file di storage (gzip, lzma, zlib), NULL jika tidak dikompresi
+            digest_only INTEGER NOT NULL DEFAULT 0, -- 1 jika hanya digest yang ditandatangani (file tidak disimpan)
+            file_size INTEGER                  -- Ukuran file asli dalam byte (opsional)
+        )
+    ''')
+
+    # Database lama belum memiliki kolom-kolom berikut; baris lama memakai nilai default
+    _add_column_if_missing(cursor, 'documents', 'signature_algorithm', "TEXT NOT NULL DEFAULT 'rsa-pss'")
+    _add_column_if_missing(cursor, 'documents', 'last_verified_at', "DATETIME")
+    _add_column_if_missing(cursor, 'documents', 'integrity_status', "TEXT")
+    _add_column_if_missing(cursor, 'documents', 'storage_codec', "TEXT")
+    _add_column_if_missing(cursor, 'documents', 'digest_only', "INTEGER NOT NULL DEFAULT 0")
+    _add_column_if_missing(cursor, 'documents', 'file_size', "INTEGER")
+
+    # Index untuk pencarian dokumen berdasarkan nama file unik di storage (dipakai oleh /get_signature_info)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_filename ON documents (filename)")
+    # Index untuk daftar dokumen per penanda tangan (dipakai oleh /documents)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_signer ON documents (signer_user_id, id)")
+
 def initialize_database():
     """
     Menginisialisasi database SQLite, membuat tabel jika belum ada.
@@ -13,23 +82,7 @@ def initialize_database():
         cursor = conn.cursor()
 
         # Tabel untuk menyimpan informasi dokumen dan tanda tangan
-        # Menambahkan kolom 'signer_user_id' untuk merelasikan dokumen dengan pengguna yang menandatangani
-        # Menambahkan kolom 'original_filename' untuk menyimpan nama file asli dari user
-        # Menambahkan kolom 'publisher_name' untuk nama perusahaan/penerbit tanda tangan
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS documents (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT NOT NULL,            -- Ini akan menjadi nama file unik yang disimpan di storage
-                original_filename TEXT NOT NULL,   -- Nama file asli yang diunggah oleh pengguna
-                original_file_path TEXT NOT NULL,  -- Path ke file asli di storage (akan menggunakan 'filename' unik)
-                document_hash TEXT NOT NULL,       -- Hash dari dokumen asli (misal: SHA256)
-                public_key TEXT NOT NULL,          -- Kunci publik yang digunakan untuk verifikasi
-                signature TEXT NOT NULL,           -- Tanda tangan digital
-                signer_user_id TEXT NOT NULL,      -- ID pengguna yang menandatangani dokumen
-                publisher_name TEXT,               -- Nama perusahaan/penerbit tanda tangan (opsional, bisa NULL)
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        create_documents_table(cursor)
 
         # Tabel untuk menyimpan kunci privat (path ke file) dan publik
         # Kunci privat sekarang disimpan di file, dan path-nya disimpan di sini.
@@ -39,10 +92,14 @@ def initialize_database():
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id TEXT UNIQUE NOT NULL,
                 private_key_path TEXT NOT NULL,    -- Path ke file kunci privat
-                public_key TEXT NOT NULL
+                public_key TEXT NOT NULL,
+                algorithm TEXT NOT NULL DEFAULT 'rsa-pss' -- Algoritma kunci: rsa-pss, ed25519, atau ecdsa-p256
             )
         ''')
 
+        # Database lama belum memiliki kolom algoritma; baris lama otomatis bernilai 'rsa-pss'
+        _add_column_if_missing(cursor, 'keys', 'algorithm', "TEXT NOT NULL DEFAULT 'rsa-pss'")
+
         # --- Tabel user_profiles untuk menyimpan nama pengguna ---
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS user_profiles (
@@ -52,11 +109,49 @@ def initialize_database():
         ''')
         # --- Akhir tabel user_profiles ---
 
+        # --- Tabel scrub_checkpoints untuk menyimpan posisi terakhir scrubber integritas ---
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scrub_checkpoints (
+                name TEXT PRIMARY KEY NOT NULL,    -- Nama scrubber (memungkinkan lebih dari satu scrubber)
+                last_document_id INTEGER NOT NULL DEFAULT 0, -- ID dokumen terakhir yang sudah diperiksa
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # --- Akhir tabel scrub_checkpoints ---
+
+        # --- Tabel signing_jobs sebagai antrian persisten untuk penandatanganan asinkron ---
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS signing_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT UNIQUE NOT NULL,       -- ID job (UUID) yang dikembalikan ke klien
+                status TEXT NOT NULL DEFAULT 'pending', -- pending, processing, done, failed
+                user_id TEXT NOT NULL,             -- ID pengguna yang akan menandatangani
+                algorithm TEXT NOT NULL DEFAULT 'rsa-pss', -- Algoritma kunci jika kunci pengguna belum ada
+                publisher_name TEXT,
+                original_filename TEXT NOT NULL,
+                stored_filename TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                storage_codec TEXT,
+                document_id INTEGER,               -- Diisi setelah job selesai
+                document_hash TEXT,
+                signature TEXT,
+                error TEXT,                        -- Pesan error jika job gagal
+                claim_token TEXT,                  -- Token worker yang sedang memproses job (status 'processing')
+                attempts INTEGER NOT NULL DEFAULT 0, -- Berapa kali job sudah diklaim worker
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        _add_column_if_missing(cursor, 'signing_jobs', 'claim_token', 'TEXT')
+        _add_column_if_missing(cursor, 'signing_jobs', 'attempts', 'INTEGER NOT NULL DEFAULT 0')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_signing_jobs_status ON signing_jobs (status, id)")
+        # --- Akhir tabel signing_jobs ---
+
         conn.commit()
-        print(f"Database '{DATABASE_NAME}' berhasil diinisialisasi.")
+        logger.info("Database '%s' berhasil diinisialisasi.", DATABASE_NAME)
 
     except sqlite3.Error as e:
-        print(f"Error saat inisialisasi database: {e}")
+        logger.error("Error saat inisialisasi database: %s", e)
     finally:
         if conn:
             conn.close()
@@ -74,7 +169,7 @@ def add_sample_user_profiles(num_users=10):
         cursor.execute("SELECT COUNT(*) FROM user_profiles WHERE user_id = 'admin_signature'")
         if cursor.fetchone()[0] == 0:
             cursor.execute("INSERT INTO user_profiles (user_id, name) VALUES (?, ?)", ('admin_signature', 'Administrator Signature'))
-            print("Profil 'admin_signature' ditambahkan.")
+            logger.info("Profil 'admin_signature' ditambahkan.")
 
         # Tambahkan user_id 1 sampai 10 jika belum ada
         for i in range(1, num_users + 1):
@@ -83,30 +178,106 @@ def add_sample_user_profiles(num_users=10):
             cursor.execute("SELECT COUNT(*) FROM user_profiles WHERE user_id = ?", (user_id,))
             if cursor.fetchone()[0] == 0:
                 cursor.execute("INSERT INTO user_profiles (user_id, name) VALUES (?, ?)", (user_id, user_name))
-                print(f"Profil '{user_name}' (ID: {user_id}) ditambahkan.")
+                logger.info("Profil '%s' (ID: %s) ditambahkan.", user_name, user_id)
         conn.commit()
-        print(f"Total {num_users} profil pengguna sampel ditambahkan/diperbarui.")
+        invalidate_user_name_cache()
+        logger.info("Total %d profil pengguna sampel ditambahkan/diperbarui.", num_users)
     except sqlite3.Error as e:
-        print(f"Error saat menambahkan profil pengguna sampel: {e}")
+        logger.error("Error saat menambahkan profil pengguna sampel: %s", e)
     finally:
         if conn:
             conn.close()
 
+def get_cached_user_name(user_id):
+    """
+    Mengambil nama pengguna dari cache di memori.
+    Returns:
+        tuple: (True, name) jika ada di cache dan belum kedaluwarsa, (False, None) jika tidak.
+    """
+    with _user_profile_cache_lock:
+        entry = _user_profile_cache.get(user_id)
+        if entry is None:
+            return False, None
+        name, expires_at = entry
+        if expires_at < time.monotonic():
+            del _user_profile_cache[user_id]
+            return False, None
+        return True, name
+
+def get_user_name_cache_generation():
+    """
+    Mengembalikan generasi cache saat ini; ambil sebelum membaca user_profiles lalu berikan ke cache_user_name().
+    """
+    with _user_profile_cache_lock:
+        return _user_profile_cache_generation
+
+def cache_user_name(user_id, name, generation=None):
+    """
+    Menyimpan nama pengguna ke cache di memori dengan masa berlaku USER_PROFILE_CACHE_TTL.
+    Jika generation diberikan dan cache sudah dihapus sejak generasi itu, nama tidak disimpan
+    (nama tersebut mungkin dibaca sebelum profil diperbarui).
+    """
+    with _user_profile_cache_lock:
+        if generation is not None and generation != _user_profile_cache_generation:
+            return
+        _user_profile_cache[user_id] = (name, time.monotonic() + USER_PROFILE_CACHE_TTL)
+
+def invalidate_user_name_cache(user_id=None):
+    """
+    Menghapus entri cache untuk user_id tertentu, atau seluruh cache jika user_id None.
+    """
+    global _user_profile_cache_generation
+    with _user_profile_cache_lock:
+        _user_profile_cache_generation += 1
+        if user_id is None:
+            _user_profile_cache.clear()
+        else:
+            _user_profile_cache.pop(user_id, None)
+
+def update_user_profile(user_id, name):
+    """
+    Menambahkan atau memperbarui nama pengguna di user_profiles, lalu menghapus cache-nya.
+    Returns:
+        bool: True jika berhasil, False jika gagal.
+    """
+    conn = None
+    try:
+        conn = sqlite3.connect(DATABASE_NAME)
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR REPLACE INTO user_profiles (user_id, name) VALUES (?, ?)", (user_id, name))
+        conn.commit()
+        logger.info("Profil '%s' diperbarui menjadi '%s'.", user_id, name)
+        return True
+    except sqlite3.Error as e:
+        logger.error("Error saat memperbarui profil pengguna: %s", e)
+        return False
+    finally:
+        if conn:
+            conn.close()
+        # Hapus cache setelah commit agar pembaca berikutnya mengambil nama terbaru
+        invalidate_user_name_cache(user_id)
+
 def get_user_name_by_id(user_id):
     """
     Mengambil nama lengkap pengguna berdasarkan user_id.
+    Hasil lookup (termasuk jika tidak ditemukan) disimpan di cache selama USER_PROFILE_CACHE_TTL.
     """
+    found, name = get_cached_user_name(user_id)
+    if found:
+        return name
+
+    generation = get_user_name_cache_generation()
     conn = None
     try:
         conn = sqlite3.connect(DATABASE_NAME)
         cursor = conn.cursor()
         cursor.execute("SELECT name FROM user_profiles WHERE user_id = ?", (user_id,))
         result = cursor.fetchone()
-        if result:
-            return result[0]
-        return None
+        name = result[0] if result else None
+        cache_user_name(user_id, name, generation)
+        return name
     except sqlite3.Error as e:
-        print(f"Error saat mengambil nama pengguna: {e}")
+        logger.error("Error saat mengambil nama pengguna: %s", e)
         return None
     finally:
         if conn:
@@ -2,16 +2,23 @@ import hashlib
 import os
 import sqlite3
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric import padding, ec
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
 # Mengimpor fungsi yang diperbarui dari key.py
-from key import get_private_key_content, get_public_key
+from key import get_private_key_content, get_public_key, get_key_algorithm, DEFAULT_ALGORITHM, ALGORITHM_RSA_PSS, ALGORITHM_ED25519, ALGORITHM_ECDSA_P256
+from database import get_user_name_by_id
+from partition import (MAIN_PARTITION, connect_partition, decode_document_id, encode_document_id,
+                       list_partitions, partition_for_new_document, query_partition, query_all_partitions)
+from storage import open_stored_file, sharded_path
+from logger import get_logger, log_stage
 
 import qrcode # Import pustaka qrcode
 import io     # Import io untuk menangani data biner di memori
 import base64 # Import base64 untuk encoding gambar
 
+logger = get_logger(__name__)
+
 DATABASE_NAME = 'digital_signature.db'
 STORAGE_DIR = 'uploaded_files' # Direktori untuk menyimpan file asli
 
@@ -19,47 +26,104 @@ STORAGE_DIR = 'uploaded_files' # Direktori untuk menyimpan file asli
 if not os.path.exists(STORAGE_DIR):
     os.makedirs(STORAGE_DIR)
 
-def calculate_file_hash(filepath, hash_algorithm="sha256", chunk_size=4096):
+def calculate_file_hash(filepath, hash_algorithm="sha256", chunk_size=4096, on_chunk=None, storage_codec=None):
     """
     Menghitung hash (checksum) dari sebuah file.
     Args:
         filepath (str): Path lengkap ke file.
         hash_algorithm (str): Algoritma hash yang akan digunakan (misal: "md5", "sha1", "sha256", "sha512").
         chunk_size (int): Ukuran chunk (dalam byte) untuk membaca file.
+        on_chunk (callable, optional): Dipanggil dengan jumlah byte setiap chunk dibaca (misal untuk membatasi laju I/O).
+        storage_codec (str, optional): Codec kompresi file di storage. Hash selalu dihitung atas data asli (setelah dekompresi).
     Returns:
         str: Nilai hash heksadesimal dari file, atau None jika file tidak ditemukan.
     """
     if not os.path.exists(filepath):
-        print(f"Error: File tidak ditemukan di '{filepath}'")
+        logger.error("File tidak ditemukan di '%s'", filepath)
         return None
 
     try:
         hasher = hashlib.new(hash_algorithm)
-        with open(filepath, 'rb') as f:
+        with open_stored_file(filepath, storage_codec) as f:
             while True:
                 chunk = f.read(chunk_size)
                 if not chunk:
                     break
+                if on_chunk:
+                    on_chunk(len(chunk))
                 hasher.update(chunk)
         return hasher.hexdigest()
     except Exception as e:
-        print(f"Terjadi kesalahan saat menghitung hash file: {e}")
+        logger.error("Terjadi kesalahan saat menghitung hash file: %s", e)
         return None
 
-def sign_document(document_path, user_id):
+def sign_digest(private_key, hashed_data, algorithm=DEFAULT_ALGORITHM):
     """
-    Menandatangani dokumen menggunakan kunci privat pengguna.
+    Menandatangani hash dokumen (bytes) dengan kunci privat sesuai algoritma.
     Args:
-        document_path (str): Path ke dokumen yang akan ditandatangani.
-        user_id (str): ID pengguna yang akan menandatangani dokumen.
+        private_key: Objek kunci privat (RSA, Ed25519, atau EC P-256).
+        hashed_data (bytes): Hash SHA256 dokumen.
+        algorithm (str): Algoritma tanda tangan ('rsa-pss', 'ed25519', 'ecdsa-p256').
     Returns:
-        tuple: (signature_hex, doc_hash) jika berhasil, (None, None) jika gagal.
+        bytes: Tanda tangan digital.
+    Raises:
+        ValueError: Jika algoritma tidak didukung.
+    """
+    if algorithm == ALGORITHM_RSA_PSS:
+        return private_key.sign(
+            hashed_data,
+            padding.PSS(
+                mgf=padding.MGF1(hashes.SHA256()),
+                salt_length=padding.PSS.MAX_LENGTH
+            ),
+            hashes.SHA256()
+        )
+    if algorithm == ALGORITHM_ED25519:
+        return private_key.sign(hashed_data)
+    if algorithm == ALGORITHM_ECDSA_P256:
+        return private_key.sign(hashed_data, ec.ECDSA(hashes.SHA256()))
+    raise ValueError(f"Algoritma '{algorithm}' tidak didukung.")
+
+def verify_digest(public_key, signature, hashed_data, algorithm=DEFAULT_ALGORITHM):
+    """
+    Memverifikasi tanda tangan atas hash dokumen (bytes) sesuai algoritma.
+    Raises:
+        InvalidSignature: Jika tanda tangan tidak cocok.
+        ValueError: Jika algoritma tidak didukung.
+    """
+    if algorithm == ALGORITHM_RSA_PSS:
+        public_key.verify(
+            signature,
+            hashed_data,
+            padding.PSS(
+                mgf=padding.MGF1(hashes.SHA256()),
+                salt_length=padding.PSS.MAX_LENGTH
+            ),
+            hashes.SHA256()
+        )
+    elif algorithm == ALGORITHM_ED25519:
+        public_key.verify(signature, hashed_data)
+    elif algorithm == ALGORITHM_ECDSA_P256:
+        public_key.verify(signature, hashed_data, ec.ECDSA(hashes.SHA256()))
+    else:
+        raise ValueError(f"Algoritma '{algorithm}' tidak didukung.")
+
+def sign_document_hash(doc_hash, user_id):
+    """
+    Menandatangani hash SHA256 dokumen (hex) menggunakan kunci privat pengguna.
+    Parameter tanda tangan sama dengan sign_document, sehingga klien yang hanya mengirim digest
+    mendapatkan tanda tangan yang identik formatnya dengan upload file penuh.
+    Args:
+        doc_hash (str): Hash SHA256 dokumen dalam format heksadesimal.
+        user_id (str): ID pengguna yang akan menandatangani.
+    Returns:
+        str: Tanda tangan dalam format heksadesimal, atau None jika gagal.
     """
     # Mengambil konten kunci privat dari file
     private_key_pem_content = get_private_key_content(user_id)
     if not private_key_pem_content:
-        print(f"Error: Kunci privat untuk user '{user_id}' tidak ditemukan atau tidak dapat dibaca.")
-        return None, None
+        logger.error("Kunci privat untuk user '%s' tidak ditemukan atau tidak dapat dibaca.", user_id)
+        return None
 
     try:
         # Load kunci privat dari konten PEM
@@ -69,70 +133,94 @@ def sign_document(document_path, user_id):
             backend=default_backend()
         )
 
-        # Hitung hash dokumen
-        doc_hash = calculate_file_hash(document_path, "sha256")
-        if not doc_hash:
-            return None, None
-
         # Konversi hash ke bytes untuk ditandatangani
         hashed_data = bytes.fromhex(doc_hash)
 
-        # Lakukan tanda tangan digital
-        signature = private_key.sign(
-            hashed_data,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
-        return signature.hex(), doc_hash # Mengembalikan signature dalam format heksadesimal
+        # Lakukan tanda tangan digital sesuai algoritma kunci pengguna
+        algorithm = get_key_algorithm(user_id) or DEFAULT_ALGORITHM
+        with log_stage('sign', logger, algorithm=algorithm):
+            signature = sign_digest(private_key, hashed_data, algorithm)
+        return signature.hex() # Mengembalikan signature dalam format heksadesimal
     except Exception as e:
-        print(f"Error saat menandatangani dokumen: {e}")
-        return None, None
+        logger.error("Error saat menandatangani dokumen: %s", e)
+        return None
 
-def verify_signature(document_path, public_key_pem, signature_hex):
+def sign_document(document_path, user_id, storage_codec=None):
     """
-    Memverifikasi tanda tangan digital menggunakan kunci publik.
+    Menandatangani dokumen menggunakan kunci privat pengguna.
+    Algoritma tanda tangan mengikuti algoritma kunci pengguna yang tercatat di tabel keys.
     Args:
-        document_path (str): Path ke dokumen yang akan diverifikasi.
-        public_key_pem (str): Konten kunci publik dalam format PEM.
-        signature_hex (str): Tanda tangan digital dalam format heksadesimal.
+        document_path (str): Path ke dokumen yang akan ditandatangani.
+        user_id (str): ID pengguna yang akan menandatangani dokumen.
+        storage_codec (str, optional): Codec kompresi file di storage.
+    Returns:
+        tuple: (signature_hex, doc_hash) jika berhasil, (None, None) jika gagal.
+    """
+    # Hitung hash dokumen
+    with log_stage('hash', logger):
+        doc_hash = calculate_file_hash(document_path, "sha256", storage_codec=storage_codec)
+    if not doc_hash:
+        return None, None
+
+    signature_hex = sign_document_hash(doc_hash, user_id)
+    if not signature_hex:
+        return None, None
+    return signature_hex, doc_hash
+
+def verify_document_hash(doc_hash, public_key_pem, signature_hex, algorithm=DEFAULT_ALGORITHM):
+    """
+    Memverifikasi tanda tangan atas hash SHA256 dokumen (hex) tanpa membaca file.
     Returns:
         bool: True jika verifikasi berhasil, False jika gagal.
     """
     try:
-        # Load kunci publik dari konten PEM
         public_key = serialization.load_pem_public_key(
             public_key_pem.encode('utf-8'),
             backend=default_backend()
         )
+        with log_stage('verify', logger, algorithm=algorithm):
+            verify_digest(public_key, bytes.fromhex(signature_hex), bytes.fromhex(doc_hash), algorithm)
+        return True
+    except Exception as e:
+        logger.warning("Verifikasi gagal: %r", e)
+        return False
 
-        # Hitung hash dokumen
-        doc_hash = calculate_file_hash(document_path, "sha256")
-        if not doc_hash:
-            return False
+def verify_signature(document_path, public_key_pem, signature_hex, algorithm=DEFAULT_ALGORITHM, storage_codec=None):
+    """
+    Memverifikasi tanda tangan digital menggunakan kunci publik.
+    Args:
+        document_path (str): Path ke dokumen yang akan diverifikasi.
+        public_key_pem (str): Konten kunci publik dalam format PEM.
+        signature_hex (str): Tanda tangan digital dalam format heksadesimal.
+        algorithm (str): Algoritma tanda tangan yang tercatat pada dokumen.
+        storage_codec (str, optional): Codec kompresi file di storage.
+    Returns:
+        bool: True jika verifikasi berhasil, False jika gagal.
+    """
+    # Hitung hash dokumen
+    with log_stage('hash', logger):
+        doc_hash = calculate_file_hash(document_path, "sha256", storage_codec=storage_codec)
+    if not doc_hash:
+        return False
 
-        # Konversi hash dan signature dari hex ke bytes
-        hashed_data = bytes.fromhex(doc_hash)
-        signature = bytes.fromhex(signature_hex)
+    # Lakukan verifikasi
+    return verify_document_hash(doc_hash, public_key_pem, signature_hex, algorithm)
 
-        # Lakukan verifikasi
-        public_key.verify(
-            signature,
-            hashed_data,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
-        return True # Verifikasi berhasil
-    except Exception as e:
-        print(f"Verifikasi gagal: {e}")
-        return False # Verifikasi gagal
+def insert_document_info(cursor, filename_on_storage, original_filename, original_file_path, document_hash, public_key_pem, signature_hex, signer_user_id, publisher_name, signature_algorithm=DEFAULT_ALGORITHM, storage_codec=None, digest_only=False, file_size=None, schema='main'):
+    """
+    Menjalankan INSERT informasi dokumen memakai cursor yang sudah ada (tanpa commit),
+    sehingga beberapa dokumen dapat disimpan dalam satu transaksi.
+    Parameter schema memungkinkan INSERT ke database partisi yang di-ATTACH ke koneksi yang sama.
+    Returns:
+        int: ID lokal dokumen yang baru disimpan (di dalam database/partisi tersebut).
+    """
+    cursor.execute(f'''
+        INSERT INTO {schema}.documents (filename, original_filename, original_file_path, document_hash, public_key, signature, signer_user_id, publisher_name, signature_algorithm, storage_codec, digest_only, file_size)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (filename_on_storage, original_filename, original_file_path, document_hash, public_key_pem, signature_hex, signer_user_id, publisher_name, signature_algorithm, storage_codec, 1 if digest_only else 0, file_size))
+    return cursor.lastrowid
 
-def save_document_info(filename_on_storage, original_filename, original_file_path, document_hash, public_key_pem, signature_hex, signer_user_id, publisher_name):
+def save_document_info(filename_on_storage, original_filename, original_file_path, document_hash, public_key_pem, signature_hex, signer_user_id, publisher_name, signature_algorithm=DEFAULT_ALGORITHM, storage_codec=None, digest_only=False, file_size=None):
     """
     Menyimpan informasi dokumen dan tanda tangan ke database.
     Args:
@@ -144,22 +232,32 @@ def save_document_info(filename_on_storage, original_filename, original_file_pat
         signature_hex (str): Tanda tangan digital.
         signer_user_id (str): ID pengguna yang menandatangani dokumen.
         publisher_name (str): Nama perusahaan/penerbit tanda tangan.
+        signature_algorithm (str): Algoritma yang dipakai untuk tanda tangan.
+        storage_codec (str, optional): Codec kompresi file di storage, None jika tidak dikompresi.
+        digest_only (bool): True jika hanya digest yang ditandatangani (file tidak disimpan di server).
+        file_size (int, optional): Ukuran file asli dalam byte.
     Returns:
-        int: ID dokumen yang baru disimpan, atau None jika gagal.
+        int: ID dokumen yang baru disimpan (sudah memuat nomor partisi), atau None jika gagal.
     """
+    # Pilih partisi database sesuai PARTITION_MODE (partisi 0 = database utama)
+    partition = partition_for_new_document(signer_user_id)
     conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
+        conn = connect_partition(partition)
         cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO documents (filename, original_filename, original_file_path, document_hash, public_key, signature, signer_user_id, publisher_name)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (filename_on_storage, original_filename, original_file_path, document_hash, public_key_pem, signature_hex, signer_user_id, publisher_name))
+        local_id = insert_document_info(
+            cursor, filename_on_storage, original_filename, original_file_path, document_hash,
+            public_key_pem, signature_hex, signer_user_id, publisher_name, signature_algorithm, storage_codec,
+            digest_only, file_size
+        )
+        # Dihitung sebelum commit: jika partisi sudah penuh, dokumen tidak disimpan
+        doc_id = encode_document_id(partition, local_id)
         conn.commit()
-        print(f"Informasi dokumen '{original_filename}' (disimpan sebagai '{filename_on_storage}') oleh '{signer_user_id}' berhasil disimpan.")
-        return cursor.lastrowid
-    except sqlite3.Error as e:
-        print(f"Error saat menyimpan informasi dokumen: {e}")
+        logger.debug("Informasi dokumen '%s' (disimpan sebagai '%s') oleh '%s' berhasil disimpan.",
+                     original_filename, filename_on_storage, signer_user_id)
+        return doc_id
+    except (sqlite3.Error, ValueError) as e:
+        logger.error("Error saat menyimpan informasi dokumen: %s", e)
         return None
     finally:
         if conn:
@@ -174,31 +272,92 @@ def get_document_info(doc_id=None, filename=None):
     Returns:
         dict: Informasi dokumen sebagai dictionary, atau None jika tidak ditemukan.
     """
+    if doc_id:
+        # Nomor partisi terkandung di dalam ID dokumen, jadi cukup satu query ke satu file
+        partition, local_id = decode_document_id(doc_id)
+        rows = query_partition(partition, "SELECT * FROM documents WHERE id = ?", (local_id,))
+    elif filename:
+        # Mencari berdasarkan nama file unik di storage (fan-out ke semua partisi)
+        rows = query_all_partitions("SELECT * FROM documents WHERE filename = ?", (filename,))
+    else:
+        return None
+    return rows[0] if rows else None
+
+def list_documents(signer_user_id=None, limit=100):
+    """
+    Mengambil daftar dokumen terbaru dari semua partisi secara paralel.
+    Args:
+        signer_user_id (str, optional): Hanya dokumen dari penanda tangan ini.
+        limit (int): Jumlah dokumen maksimal.
+    Returns:
+        list: Daftar dokumen (dict) diurutkan dari yang terbaru.
+    """
+    columns = ("id, filename, original_filename, document_hash, signer_user_id, publisher_name, timestamp, "
+               "signature_algorithm, digest_only, file_size, integrity_status, last_verified_at")
+    if signer_user_id:
+        rows = query_all_partitions(
+            f"SELECT {columns} FROM documents WHERE signer_user_id = ? ORDER BY id DESC LIMIT ?", (signer_user_id, limit))
+    else:
+        rows = query_all_partitions(f"SELECT {columns} FROM documents ORDER BY id DESC LIMIT ?", (limit,))
+    rows.sort(key=lambda row: (row['timestamp'] or '', row['id']), reverse=True)
+    return rows[:limit]
+
+def get_document_info_with_signer(doc_id=None, filename=None):
+    """
+    Mengambil informasi dokumen beserta nama lengkap penanda tangan dalam satu query (JOIN ke user_profiles).
+    Args:
+        doc_id (int, optional): ID dokumen.
+        filename (str, optional): Nama file unik di storage.
+    Returns:
+        dict: Informasi dokumen dengan tambahan kunci 'signer_fullname', atau None jika tidak ditemukan.
+    """
+    if doc_id:
+        partition, local_id = decode_document_id(doc_id)
+        if partition != MAIN_PARTITION:
+            # user_profiles hanya ada di database utama; nama penanda tangan diambil dari cache
+            return _with_signer_name(get_document_info(doc_id=doc_id))
+        where_clause, param = "d.id = ?", local_id
+    elif filename:
+        where_clause, param = "d.filename = ?", filename
+    else:
+        return None
+
     conn = None
     try:
         conn = sqlite3.connect(DATABASE_NAME)
         cursor = conn.cursor()
-        if doc_id:
-            cursor.execute("SELECT * FROM documents WHERE id = ?", (doc_id,))
-        elif filename:
-            # Mencari berdasarkan nama file unik di storage
-            cursor.execute("SELECT * FROM documents WHERE filename = ?", (filename,))
-        else:
-            return None
+        cursor.execute(f'''
+            SELECT d.*, p.name AS signer_fullname
+            FROM documents d
+            LEFT JOIN user_profiles p ON p.user_id = d.signer_user_id
+            WHERE {where_clause}
+        ''', (param,))
 
         result = cursor.fetchone()
-        if result:
-            # Mengembalikan data sebagai dictionary untuk kemudahan akses
-            columns = [description[0] for description in cursor.description]
-            return dict(zip(columns, result))
-        return None
+        if not result:
+            # Dokumen mungkin berada di partisi lain
+            if filename and len(list_partitions()) > 1:
+                return _with_signer_name(get_document_info(filename=filename))
+            return None
+        columns = [description[0] for description in cursor.description]
+        # Nama dari JOIN tidak disimpan ke cache: profil bisa saja diperbarui (dan cache dihapus)
+        # setelah SELECT ini, sehingga nama lama akan kembali tersimpan selama USER_PROFILE_CACHE_TTL
+        return dict(zip(columns, result))
     except sqlite3.Error as e:
-        print(f"Error saat mengambil informasi dokumen: {e}")
+        logger.error("Error saat mengambil informasi dokumen: %s", e)
         return None
     finally:
         if conn:
             conn.close()
 
+def _with_signer_name(doc_info):
+    """
+    Menambahkan 'signer_fullname' ke informasi dokumen memakai cache profil pengguna.
+    """
+    if doc_info:
+        doc_info['signer_fullname'] = get_user_name_by_id(doc_info['signer_user_id'])
+    return doc_info
+
 def generate_qr_code_for_doc_info(document_id, base_url):
     """
     Menghasilkan QR code yang mengarah ke endpoint get_signature_info untuk dokumen tertentu.
@@ -233,7 +392,7 @@ def generate_qr_code_for_doc_info(document_id, base_url):
         img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
         return img_str
     except Exception as e:
-        print(f"Error saat menghasilkan QR code: {e}")
+        logger.error("Error saat menghasilkan QR code: %s", e)
         return None
 
 if __name__ == "__main__":
@@ -261,7 +420,7 @@ if __name__ == "__main__":
     # Kita akan membuat nama file unik untuk penyimpanan
     import uuid
     stored_dummy_file_name = f"{uuid.uuid4()}_{original_dummy_file_name}"
-    dummy_file_path = os.path.join(STORAGE_DIR, stored_dummy_file_name)
+    dummy_file_path = sharded_path(STORAGE_DIR, stored_dummy_file_name)
 
     with open(dummy_file_path, "w") as f:
         f.write("Ini adalah isi dokumen yang akan ditandatangani secara digital.\n")
@@ -280,7 +439,8 @@ if __name__ == "__main__":
         # Menambahkan original_filename dan menggunakan filename_on_storage
         doc_db_id = save_document_info(
             stored_dummy_file_name, original_dummy_file_name, dummy_file_path,
-            doc_hash, public_key_signer, signature_hex, test_user_id, "Contoh Perusahaan" # Menambahkan publisher_name
+            doc_hash, public_key_signer, signature_hex, test_user_id, "Contoh Perusahaan", # Menambahkan publisher_name
+            get_key_algorithm(test_user_id)
         )
         if doc_db_id:
             print(f"Informasi tanda tangan disimpan dengan ID: {doc_db_id}")
@@ -298,7 +458,8 @@ if __name__ == "__main__":
                 is_valid = verify_signature(
                     retrieved_doc_info['original_file_path'], # Ini akan merujuk ke path dengan nama unik
                     retrieved_doc_info['public_key'],
-                    retrieved_doc_info['signature']
+                    retrieved_doc_info['signature'],
+                    retrieved_doc_info['signature_algorithm']
                 )
                 print(f"Verifikasi tanda tangan: {'BERHASIL' if is_valid else 'GAGAL'}")
 
@@ -309,7 +470,8 @@ if __name__ == "__main__":
                 is_valid_after_mod = verify_signature(
                     retrieved_doc_info['original_file_path'],
                     retrieved_doc_info['public_key'],
-                    retrieved_doc_info['signature']
+                    retrieved_doc_info['signature'],
+                    retrieved_doc_info['signature_algorithm']
                 )
                 print(f"Verifikasi tanda tangan setelah modifikasi: {'BERHASIL' if is_valid_after_mod else 'GAGAL'}")
             
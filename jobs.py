@@ -0,0 +1,376 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.backends import default_backend
+
+from database import DATABASE_NAME
+from key import generate_key_pair, save_key_pair, get_private_key_content, get_public_key, get_key_algorithm, DEFAULT_ALGORITHM
+from generate import calculate_file_hash, sign_digest, insert_document_info
+from partition import MAIN_PARTITION, connect_partition, encode_document_id, partition_database_name, partition_for_new_document
+from logger import begin_request, end_request, get_logger, log_stage
+
+logger = get_logger(__name__)
+
+# --- Konfigurasi worker penandatanganan asinkron ---
+JOB_WORKERS = 2              # Jumlah thread worker
+JOB_BATCH_SIZE = 20          # Jumlah job maksimal yang diproses dalam satu micro-batch
+JOB_POLL_INTERVAL = 1.0      # Jeda (detik) memeriksa antrian jika tidak ada job baru
+JOB_BATCH_LINGER = 0.05      # Waktu tunggu (detik) setelah ada job baru agar job lain ikut terkumpul dalam batch yang sama
+JOB_STALE_TIMEOUT = 300      # Job 'processing' lebih lama dari ini (detik) dianggap macet dan dikembalikan ke antrian
+JOB_MAX_ATTEMPTS = 3         # Job yang sudah diklaim sebanyak ini dan tetap gagal disimpan ditandai 'failed'
+JOB_MAX_ATTACHED_PARTITIONS = 8 # Batas file partisi yang di-ATTACH per transaksi (batas bawaan SQLite adalah 10)
+# --- Akhir konfigurasi ---
+
+JOB_PENDING = 'pending'
+JOB_PROCESSING = 'processing'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+# Dibangunkan setiap ada job baru agar worker tidak perlu menunggu JOB_POLL_INTERVAL
+_jobs_available = threading.Event()
+
+def enqueue_signing_job(user_id, original_filename, stored_filename, file_path, storage_codec=None,
+                        publisher_name=None, algorithm=DEFAULT_ALGORITHM):
+    """
+    Menambahkan job penandatanganan ke antrian persisten.
+    Returns:
+        str: ID job, atau None jika gagal.
+    """
+    job_id = str(uuid.uuid4())
+    conn = None
+    try:
+        conn = sqlite3.connect(DATABASE_NAME)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO signing_jobs (job_id, user_id, algorithm, publisher_name, original_filename, stored_filename, file_path, storage_codec)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (job_id, user_id, algorithm, publisher_name, original_filename, stored_filename, file_path, storage_codec))
+        conn.commit()
+        _jobs_available.set()
+        return job_id
+    except sqlite3.Error as e:
+        logger.error("Error saat menambahkan job penandatanganan: %s", e)
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def get_signing_job(job_id):
+    """
+    Mengambil status job penandatanganan berdasarkan job_id.
+    Returns:
+        dict: Data job, atau None jika tidak ditemukan.
+    """
+    conn = None
+    try:
+        conn = sqlite3.connect(DATABASE_NAME)
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM signing_jobs WHERE job_id = ?", (job_id,))
+        result = cursor.fetchone()
+        if result:
+            columns = [description[0] for description in cursor.description]
+            return dict(zip(columns, result))
+        return None
+    except sqlite3.Error as e:
+        logger.error("Error saat mengambil job penandatanganan: %s", e)
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def claim_pending_jobs(batch_size=JOB_BATCH_SIZE):
+    """
+    Mengambil sejumlah job 'pending' dan menandainya 'processing' secara atomik,
+    sehingga aman dipakai oleh beberapa worker (juga dari proses berbeda).
+    Setiap klaim mendapat claim_token baru; hasil job hanya disimpan jika token tersebut masih berlaku.
+    Returns:
+        list: Daftar job (dict), masing-masing dengan 'claim_token' milik klaim ini.
+    """
+    claim_token = uuid.uuid4().hex
+    conn = None
+    try:
+        conn = sqlite3.connect(DATABASE_NAME)
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        # Kembalikan job yang macet (misal worker berhenti di tengah jalan) ke antrian,
+        # kecuali job yang sudah diklaim JOB_MAX_ATTEMPTS kali: job tersebut ditandai 'failed'
+        stale_params = (JOB_PROCESSING, f"-{JOB_STALE_TIMEOUT} seconds", JOB_MAX_ATTEMPTS)
+        cursor.execute('''
+            SELECT job_id, file_path FROM signing_jobs WHERE status = ? AND updated_at < datetime('now', ?) AND attempts >= ?
+        ''', stale_params)
+        exhausted = cursor.fetchall()
+        cursor.execute('''
+            UPDATE signing_jobs SET status = ?, error = ?, claim_token = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE status = ? AND updated_at < datetime('now', ?) AND attempts >= ?
+        ''', (JOB_FAILED, f"Job tidak selesai setelah {JOB_MAX_ATTEMPTS} kali percobaan.") + stale_params)
+        cursor.execute('''
+            UPDATE signing_jobs SET status = ?, claim_token = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE status = ? AND updated_at < datetime('now', ?)
+        ''', (JOB_PENDING, JOB_PROCESSING, f"-{JOB_STALE_TIMEOUT} seconds"))
+        cursor.execute("SELECT * FROM signing_jobs WHERE status = ? ORDER BY id LIMIT ?", (JOB_PENDING, batch_size))
+        columns = [description[0] for description in cursor.description]
+        jobs = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        if jobs:
+            cursor.executemany('''
+                UPDATE signing_jobs SET status = ?, claim_token = ?, attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+            ''', [(JOB_PROCESSING, claim_token, job['id']) for job in jobs])
+            for job in jobs:
+                job['status'], job['claim_token'], job['attempts'] = JOB_PROCESSING, claim_token, job['attempts'] + 1
+        conn.commit()
+        for job_id, file_path in exhausted:
+            logger.warning("Job %s gagal: tidak selesai setelah %d kali percobaan.", job_id, JOB_MAX_ATTEMPTS,
+                           extra={'job_id': job_id})
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        return jobs
+    except sqlite3.Error as e:
+        logger.error("Error saat mengambil job dari antrian: %s", e)
+        return []
+    finally:
+        if conn:
+            conn.close()
+
+def _load_signer(user_id, algorithm):
+    """
+    Menyiapkan kunci penanda tangan satu kali per batch (membuat kunci jika belum ada).
+    Returns:
+        tuple: (private_key, public_key_pem, algorithm) atau (None, None, pesan_error).
+    """
+    if not get_private_key_content(user_id):
+        private_key_path, public_key_pem = generate_key_pair(user_id, algorithm)
+        if not (private_key_path and public_key_pem and save_key_pair(user_id, private_key_path, public_key_pem, algorithm)):
+            return None, None, f"Gagal membuat kunci baru untuk user '{user_id}'."
+
+    private_key_pem_content = get_private_key_content(user_id)
+    public_key_pem = get_public_key(user_id)
+    if not private_key_pem_content or not public_key_pem:
+        return None, None, f"Kunci untuk user '{user_id}' tidak tersedia."
+    try:
+        private_key = serialization.load_pem_private_key(
+            private_key_pem_content.encode('utf-8'),
+            password=None, # Tidak ada password untuk demo ini
+            backend=default_backend()
+        )
+    except Exception as e:
+        return None, None, f"Gagal memuat kunci privat user '{user_id}': {e}"
+    return private_key, public_key_pem, get_key_algorithm(user_id) or DEFAULT_ALGORITHM
+
+def _group_by_partition(signed, max_partitions):
+    """
+    Mengelompokkan hasil tanda tangan per partisi tujuan, maksimal max_partitions partisi per kelompok.
+    """
+    by_partition = {}
+    for item in signed:
+        by_partition.setdefault(partition_for_new_document(item[0]['user_id']), []).append(item)
+    partitions = list(by_partition)
+    return [
+        [item for partition in partitions[i:i + max_partitions] for item in by_partition[partition]]
+        for i in range(0, len(partitions), max_partitions)
+    ]
+
+def _save_job_results(signed, failed, lost):
+    """
+    Menyimpan dokumen dan status job dalam satu transaksi. File partisi di-ATTACH ke koneksi yang sama.
+    Hanya job yang klaimnya (claim_token) masih dimiliki yang disimpan; sisanya ditambahkan ke lost.
+    Raises:
+        sqlite3.Error, ValueError: Jika transaksi gagal (tidak ada yang tersimpan).
+    """
+    conn = sqlite3.connect(DATABASE_NAME)
+    try:
+        cursor = conn.cursor()
+        # ATTACH tidak bisa dijalankan di dalam transaksi, jadi file partisi disiapkan terlebih dahulu
+        partitions = {}
+        for job, *_ in signed:
+            partition = partition_for_new_document(job['user_id'])
+            if partition != MAIN_PARTITION and partition not in partitions.values():
+                connect_partition(partition).close() # Pastikan tabel documents di file partisi sudah ada
+                cursor.execute(f"ATTACH DATABASE ? AS part_{partition}", (partition_database_name(partition),))
+            partitions[job['id']] = partition
+
+        cursor.execute("BEGIN IMMEDIATE")
+        # Job yang sudah dianggap macet dan diklaim ulang worker lain tidak boleh disimpan lagi oleh batch ini
+        for job in [item[0] for item in signed] + [job for job, _ in failed]:
+            cursor.execute("SELECT 1 FROM signing_jobs WHERE id = ? AND status = ? AND claim_token = ?",
+                           (job['id'], JOB_PROCESSING, job['claim_token']))
+            if not cursor.fetchone():
+                lost.add(job['id'])
+
+        for job, doc_hash, signature_hex, public_key_pem, algorithm in signed:
+            if job['id'] in lost:
+                continue
+            partition = partitions[job['id']]
+            local_id = insert_document_info(
+                cursor, job['stored_filename'], job['original_filename'], job['file_path'], doc_hash,
+                public_key_pem, signature_hex, job['user_id'], job['publisher_name'], algorithm, job['storage_codec'],
+                schema='main' if partition == MAIN_PARTITION else f"part_{partition}"
+            )
+            doc_id = encode_document_id(partition, local_id)
+            cursor.execute('''
+                UPDATE signing_jobs SET status = ?, document_id = ?, document_hash = ?, signature = ?, claim_token = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND claim_token = ?
+            ''', (JOB_DONE, doc_id, doc_hash, signature_hex, job['id'], job['claim_token']))
+        cursor.executemany('''
+            UPDATE signing_jobs SET status = ?, error = ?, claim_token = NULL, updated_at = CURRENT_TIMESTAMP WHERE id = ? AND claim_token = ?
+        ''', [(JOB_FAILED, error, job['id'], job['claim_token']) for job, error in failed if job['id'] not in lost])
+        conn.commit()
+    finally:
+        conn.close()
+
+def _release_jobs(unsaved, lost):
+    """
+    Melepas klaim job yang hasilnya gagal disimpan: dikembalikan ke antrian, atau ditandai 'failed'
+    jika sudah diklaim JOB_MAX_ATTEMPTS kali (agar error yang menetap tidak diulang tanpa akhir).
+    Returns:
+        tuple: (job yang diulang, daftar (job, pesan_error) yang gagal permanen).
+    """
+    retried, exhausted = [], []
+    if not unsaved:
+        return retried, exhausted
+    conn = None
+    try:
+        conn = sqlite3.connect(DATABASE_NAME)
+        cursor = conn.cursor()
+        for job, error in unsaved:
+            final = job['attempts'] >= JOB_MAX_ATTEMPTS
+            cursor.execute('''
+                UPDATE signing_jobs SET status = ?, error = ?, claim_token = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND claim_token = ?
+            ''', (JOB_FAILED if final else JOB_PENDING, error, job['id'], job['claim_token']))
+            if not cursor.rowcount:
+                lost.add(job['id'])
+            elif final:
+                exhausted.append((job, error))
+            else:
+                retried.append(job)
+        conn.commit()
+    except sqlite3.Error as e:
+        # Job tetap 'processing' dan akan diambil ulang setelah JOB_STALE_TIMEOUT (attempts sudah bertambah saat klaim)
+        logger.error("Error saat melepas klaim job penandatanganan: %s", e)
+        return [], []
+    finally:
+        if conn:
+            conn.close()
+    if retried:
+        _jobs_available.set()
+    return retried, exhausted
+
+def process_job_batch(jobs):
+    """
+    Memproses satu micro-batch job: kunci dimuat sekali per penanda tangan,
+    lalu dokumen dan status job disimpan dalam satu transaksi per kelompok (maksimal
+    JOB_MAX_ATTACHED_PARTITIONS partisi dokumen per transaksi).
+    Hasil hanya disimpan untuk job yang klaimnya (claim_token) masih dimiliki batch ini, sehingga job yang
+    diklaim ulang setelah JOB_STALE_TIMEOUT tidak menghasilkan dokumen ganda.
+    Returns:
+        dict: Jumlah job 'done', 'failed', 'retry' (dikembalikan ke antrian), dan 'lost' (klaim diambil alih worker lain).
+    """
+    signers = {}
+    signed = []  # (job, doc_hash, signature_hex, public_key_pem, algorithm)
+    failed = []  # (job, pesan_error)
+    lost = set() # ID job yang klaimnya sudah tidak dimiliki batch ini
+
+    for job in jobs:
+        user_id = job['user_id']
+        if user_id not in signers:
+            signers[user_id] = _load_signer(user_id, job['algorithm'])
+        private_key, public_key_pem, algorithm = signers[user_id]
+        if private_key is None:
+            failed.append((job, algorithm))
+            continue
+
+        with log_stage('hash', logger):
+            doc_hash = calculate_file_hash(job['file_path'], "sha256", storage_codec=job['storage_codec'])
+        if not doc_hash:
+            failed.append((job, "Gagal menghitung hash dokumen."))
+            continue
+        try:
+            with log_stage('sign', logger, algorithm=algorithm):
+                signature_hex = sign_digest(private_key, bytes.fromhex(doc_hash), algorithm).hex()
+        except Exception as e:
+            failed.append((job, f"Gagal menandatangani dokumen: {e}"))
+            continue
+        signed.append((job, doc_hash, signature_hex, public_key_pem, algorithm))
+
+    # Hasil disimpan per kelompok partisi agar jumlah file partisi yang di-ATTACH dalam satu transaksi
+    # tidak melebihi batas SQLite. Job yang gagal ditandatangani ikut disimpan bersama kelompok pertama.
+    unsaved = [] # (job, pesan_error) untuk job yang hasilnya gagal disimpan
+    with log_stage('save_batch', logger, jobs=len(jobs)):
+        for index, group in enumerate(_group_by_partition(signed, JOB_MAX_ATTACHED_PARTITIONS) or [[]]):
+            group_failed = failed if index == 0 else []
+            try:
+                _save_job_results(group, group_failed, lost)
+            except (sqlite3.Error, ValueError) as e:
+                logger.error("Error saat menyimpan hasil batch penandatanganan: %s", e)
+                unsaved.extend((job, f"Gagal menyimpan hasil penandatanganan: {e}")
+                               for job in [item[0] for item in group] + [job for job, _ in group_failed])
+        retried, exhausted = _release_jobs(unsaved, lost)
+    unsaved_ids = {job['id'] for job, _ in unsaved}
+
+    for job in jobs:
+        if job['id'] in lost:
+            logger.warning("Klaim job %s sudah diambil alih worker lain, hasil batch ini dibuang.", job['job_id'],
+                           extra={'job_id': job['job_id']})
+    # Hapus file dari job yang gagal, sama seperti pada mode sinkron
+    # (file job yang klaimnya hilang tetap dipakai oleh worker yang mengambil alih)
+    final_failures = [(job, error) for job, error in failed if job['id'] not in lost and job['id'] not in unsaved_ids]
+    for job, error in final_failures + exhausted:
+        logger.warning("Job %s gagal: %s", job['job_id'], error, extra={'job_id': job['job_id']})
+        if os.path.exists(job['file_path']):
+            os.remove(job['file_path'])
+    return {
+        'done': sum(1 for job, *_ in signed if job['id'] not in lost and job['id'] not in unsaved_ids),
+        'failed': len(final_failures) + len(exhausted),
+        'retry': len(retried),
+        'lost': len(lost)
+    }
+
+def _worker_loop(stop_event, batch_size, poll_interval):
+    while not stop_event.is_set():
+        jobs = claim_pending_jobs(batch_size)
+        if not jobs:
+            if _jobs_available.wait(poll_interval):
+                _jobs_available.clear()
+                time.sleep(JOB_BATCH_LINGER)
+            continue
+        # Setiap batch dicatat dengan ID sendiri, sama seperti satu request API
+        batch_id, token = begin_request()
+        start = time.perf_counter()
+        try:
+            result = process_job_batch(jobs)
+        finally:
+            stages = end_request(token)
+        logger.info("Batch %d job selesai: %s", len(jobs), result, extra={
+            'request_id': batch_id, 'jobs': len(jobs), 'result': result, 'stages': stages,
+            'duration_ms': round((time.perf_counter() - start) * 1000, 3)
+        })
+
+def start_job_workers(num_workers=JOB_WORKERS, batch_size=JOB_BATCH_SIZE, poll_interval=JOB_POLL_INTERVAL):
+    """
+    Menjalankan thread worker (daemon) yang memproses antrian signing_jobs.
+    Returns:
+        tuple: (threads, stop_event). Panggil stop_event.set() untuk menghentikan worker.
+    """
+    stop_event = threading.Event()
+    threads = []
+    for i in range(num_workers):
+        thread = threading.Thread(target=_worker_loop, args=(stop_event, batch_size, poll_interval),
+                                  name=f"signing-worker-{i}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads, stop_event
+
+if __name__ == "__main__":
+    # Menjalankan worker sebagai proses terpisah dari API
+    from database import initialize_database
+    initialize_database()
+    threads, stop_event = start_job_workers()
+    print(f"{len(threads)} worker penandatanganan berjalan. Tekan Ctrl+C untuk berhenti.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop_event.set()
@@ -1,32 +1,69 @@
 from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import rsa, ec, ed25519
 from cryptography.hazmat.backends import default_backend
 import sqlite3
 import os
+import uuid
+from storage import sharded_path
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 DATABASE_NAME = 'digital_signature.db'
 PRIVATE_KEYS_DIR = 'private_keys' # Direktori untuk menyimpan file kunci privat
 
+# --- Algoritma tanda tangan yang didukung ---
+# 'rsa-pss'    : RSA-2048 dengan padding PSS (default, kompatibel dengan kunci lama)
+# 'ed25519'    : Ed25519, pembuatan kunci dan tanda tangan jauh lebih cepat dari RSA
+# 'ecdsa-p256' : ECDSA dengan kurva NIST P-256 dan SHA256
+ALGORITHM_RSA_PSS = 'rsa-pss'
+ALGORITHM_ED25519 = 'ed25519'
+ALGORITHM_ECDSA_P256 = 'ecdsa-p256'
+SUPPORTED_ALGORITHMS = (ALGORITHM_RSA_PSS, ALGORITHM_ED25519, ALGORITHM_ECDSA_P256)
+DEFAULT_ALGORITHM = ALGORITHM_RSA_PSS
+# --- Akhir algoritma ---
+
 # Pastikan direktori penyimpanan kunci privat ada
 if not os.path.exists(PRIVATE_KEYS_DIR):
     os.makedirs(PRIVATE_KEYS_DIR)
 
-def generate_key_pair(user_id):
+def create_private_key(algorithm=DEFAULT_ALGORITHM):
     """
-    Menghasilkan pasangan kunci RSA (privat dan publik) dan menyimpan kunci privat ke file.
-    Mengembalikan path file kunci privat dan konten kunci publik.
+    Menghasilkan objek kunci privat sesuai algoritma (tanpa menyimpannya ke file).
+    Args:
+        algorithm (str): Salah satu dari SUPPORTED_ALGORITHMS.
+    Returns:
+        Objek kunci privat dari pustaka cryptography.
+    Raises:
+        ValueError: Jika algoritma tidak didukung.
     """
-    try:
-        # Menghasilkan kunci privat RSA
-        private_key = rsa.generate_private_key(
+    if algorithm == ALGORITHM_RSA_PSS:
+        return rsa.generate_private_key(
             public_exponent=65537,
             key_size=2048, # Ukuran kunci yang umum dan aman
             backend=default_backend()
         )
+    if algorithm == ALGORITHM_ED25519:
+        return ed25519.Ed25519PrivateKey.generate()
+    if algorithm == ALGORITHM_ECDSA_P256:
+        return ec.generate_private_key(ec.SECP256R1(), backend=default_backend())
+    raise ValueError(f"Algoritma '{algorithm}' tidak didukung. Pilihan: {', '.join(SUPPORTED_ALGORITHMS)}")
+
+def generate_key_pair(user_id, algorithm=DEFAULT_ALGORITHM):
+    """
+    Menghasilkan pasangan kunci (privat dan publik) dengan algoritma yang dipilih
+    dan menyimpan kunci privat ke file.
+    Mengembalikan path file kunci privat dan konten kunci publik.
+    """
+    try:
+        # Menghasilkan kunci privat sesuai algoritma (RSA, Ed25519, atau ECDSA P-256)
+        private_key = create_private_key(algorithm)
 
         # Menserialisasi kunci privat ke format PEM dan menyimpannya ke file
-        private_key_filename = f"{user_id}_private_key.pem"
-        private_key_path = os.path.join(PRIVATE_KEYS_DIR, private_key_filename)
+        # (di subdirektori fan-out agar direktori kunci tetap kecil). Nama file dibuat unik agar dua proses
+        # yang membuat kunci untuk user yang sama secara bersamaan tidak saling menimpa file kunci.
+        private_key_filename = f"{user_id}_{uuid.uuid4().hex[:12]}_private_key.pem"
+        private_key_path = sharded_path(PRIVATE_KEYS_DIR, private_key_filename)
 
         with open(private_key_path, "wb") as f:
             f.write(private_key.private_bytes(
@@ -35,7 +72,7 @@ def generate_key_pair(user_id):
                 encryption_algorithm=serialization.NoEncryption() # TIDAK ADA ENKRIPSI UNTUK DEMO!
                                                                   # Dalam produksi, gunakan kunci sandi kuat
             ))
-        print(f"Kunci privat untuk '{user_id}' disimpan di: {private_key_path}")
+        logger.info("Kunci privat %s untuk '%s' disimpan di: %s", algorithm, user_id, private_key_path)
 
         # Menghasilkan kunci publik dari kunci privat dan menserialisasinya ke format PEM
         public_key = private_key.public_key()
@@ -46,27 +83,38 @@ def generate_key_pair(user_id):
 
         return private_key_path, pem_public_key
     except Exception as e:
-        print(f"Error saat menghasilkan pasangan kunci: {e}")
+        logger.error("Error saat menghasilkan pasangan kunci: %s", e)
         return None, None
 
-def save_key_pair(user_id, private_key_path, public_key_pem):
+def save_key_pair(user_id, private_key_path, public_key_pem, algorithm=DEFAULT_ALGORITHM):
     """
-    Menyimpan path kunci privat dan kunci publik ke database.
+    Menyimpan path kunci privat, kunci publik, dan algoritma kunci ke database.
+    Jika user sudah memiliki kunci yang filenya masih ada (misal dibuat oleh request lain secara bersamaan),
+    kunci tersebut dipertahankan dan file kunci baru dihapus. Pemanggil harus selalu memuat ulang kunci dari database.
     """
     conn = None
     try:
         conn = sqlite3.connect(DATABASE_NAME)
         cursor = conn.cursor()
 
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT private_key_path FROM keys WHERE user_id = ?", (user_id,))
+        existing = cursor.fetchone()
+        if existing and existing[0] != private_key_path and existing[0] and os.path.exists(existing[0]):
+            conn.commit()
+            logger.info("Kunci untuk '%s' sudah dibuat proses lain, kunci yang ada dipertahankan.", user_id)
+            if os.path.exists(private_key_path):
+                os.remove(private_key_path)
+            return True
         cursor.execute('''
-            INSERT OR REPLACE INTO keys (user_id, private_key_path, public_key)
-            VALUES (?, ?, ?)
-        ''', (user_id, private_key_path, public_key_pem))
+            INSERT OR REPLACE INTO keys (user_id, private_key_path, public_key, algorithm)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, private_key_path, public_key_pem, algorithm))
         conn.commit()
-        print(f"Informasi kunci untuk '{user_id}' berhasil disimpan di database.")
+        logger.info("Informasi kunci untuk '%s' berhasil disimpan di database.", user_id)
         return True
     except sqlite3.Error as e:
-        print(f"Error saat menyimpan informasi kunci: {e}")
+        logger.error("Error saat menyimpan informasi kunci: %s", e)
         return False
     finally:
         if conn:
@@ -86,7 +134,7 @@ def get_private_key_path(user_id):
             return result[0]
         return None
     except sqlite3.Error as e:
-        print(f"Error saat mengambil path kunci privat: {e}")
+        logger.error("Error saat mengambil path kunci privat: %s", e)
         return None
     finally:
         if conn:
@@ -98,13 +146,13 @@ def get_private_key_content(user_id):
     """
     private_key_path = get_private_key_path(user_id)
     if not private_key_path or not os.path.exists(private_key_path):
-        print(f"Error: File kunci privat untuk '{user_id}' tidak ditemukan di '{private_key_path}'.")
+        logger.warning("File kunci privat untuk '%s' tidak ditemukan di '%s'.", user_id, private_key_path)
         return None
     try:
         with open(private_key_path, "rb") as f:
             return f.read().decode('utf-8')
     except Exception as e:
-        print(f"Error saat membaca file kunci privat: {e}")
+        logger.error("Error saat membaca file kunci privat: %s", e)
         return None
 
 def get_public_key(user_id):
@@ -121,7 +169,27 @@ def get_public_key(user_id):
             return result[0]
         return None
     except sqlite3.Error as e:
-        print(f"Error saat mengambil kunci publik: {e}")
+        logger.error("Error saat mengambil kunci publik: %s", e)
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def get_key_algorithm(user_id):
+    """
+    Mengambil algoritma tanda tangan yang dipakai kunci pengguna dari database.
+    """
+    conn = None
+    try:
+        conn = sqlite3.connect(DATABASE_NAME)
+        cursor = conn.cursor()
+        cursor.execute("SELECT algorithm FROM keys WHERE user_id = ?", (user_id,))
+        result = cursor.fetchone()
+        if result:
+            return result[0]
+        return None
+    except sqlite3.Error as e:
+        logger.error("Error saat mengambil algoritma kunci: %s", e)
         return None
     finally:
         if conn:
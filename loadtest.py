@@ -0,0 +1,316 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Konfigurasi default load test ---
+DEFAULT_MIX = "upload=1,info=5,qrcode=2,download=2" # Bobot relatif tiap jenis request
+DEFAULT_DURATION = 30          # Durasi pengukuran per jumlah worker (detik)
+DEFAULT_CONCURRENCY = 16       # Jumlah klien bersamaan
+DEFAULT_FILE_SIZE_KB = 64      # Ukuran file yang diunggah
+DEFAULT_SEED_DOCS = 20         # Jumlah dokumen awal agar info/qrcode/download punya target
+DEFAULT_NEW_SIGNER_RATIO = 0.1 # Porsi upload dari penanda tangan baru (memicu pembuatan kunci)
+REQUEST_TIMEOUT = 60
+# --- Akhir konfigurasi ---
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+OPERATIONS = ("upload", "info", "qrcode", "download")
+LOCK_MARKER = "database is locked" # Pesan sqlite3 yang dicetak server saat terjadi lock contention
+
+def parse_mix(mix):
+    """
+    Mengubah string "upload=1,info=5" menjadi dict bobot per operasi.
+    """
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Operasi '{name}' tidak dikenal. Pilihan: {', '.join(OPERATIONS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def percentile(sorted_values, pct):
+    """
+    Mengambil nilai persentil dari list yang sudah terurut.
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(workdir, port, workers, log_path):
+    """
+    Menjalankan app.py di proses terpisah dengan 'workers' proses server (masing-masing satu request sekaligus).
+    Database, storage, dan kunci dibuat di workdir agar tidak mengganggu data asli.
+    Catatan: server werkzeug dengan processes=N melakukan fork satu proses anak per request (maksimal N
+    bersamaan), bukan pool proses yang sudah berjalan. Biaya fork dan cache yang hilang ikut terukur, sehingga
+    angka speedup lebih rendah dari server pre-fork (misal gunicorn) dengan jumlah worker yang sama.
+    """
+    code = (
+        "import app; "
+        f"app.app.run(host='127.0.0.1', port={port}, debug=False, threaded={workers == 0}, processes={max(1, workers)})"
+    )
+    env = dict(os.environ, PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""), PYTHONUNBUFFERED="1")
+    log_file = open(log_path, "w")
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=workdir, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server berhenti saat startup, lihat log: {log_path}")
+        try:
+            urllib.request.urlopen(base_url + "/", timeout=1).read()
+            return process, log_file, base_url
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server tidak merespons dalam 60 detik, lihat log: {log_path}")
+
+def stop_server(process, log_file):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    log_file.close()
+
+def _multipart_body(fields, file_field, filename, file_data):
+    """
+    Membuat body multipart/form-data (tanpa dependensi tambahan).
+    """
+    boundary = uuid.uuid4().hex
+    lines = []
+    for name, value in fields.items():
+        lines.append(f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode("utf-8"))
+    lines.append(
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"{file_field}\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: application/octet-stream\r\n\r\n".encode("utf-8")
+    )
+    lines.append(file_data)
+    lines.append(f"\r\n--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(lines), f"multipart/form-data; boundary={boundary}"
+
+class LoadClient:
+    """
+    Klien HTTP sederhana yang menjalankan satu jenis operasi dan mencatat latensi serta error.
+    """
+    def __init__(self, base_url, file_size_kb, new_signer_ratio):
+        self.base_url = base_url
+        self.file_data = os.urandom(file_size_kb * 1024)
+        self.new_signer_ratio = new_signer_ratio
+        self.document_ids = []
+        self._lock = threading.Lock()
+        self.results = _empty_results()
+
+    def _request(self, url, data=None, content_type=None):
+        request = urllib.request.Request(url, data=data)
+        if content_type:
+            request.add_header("Content-Type", content_type)
+        try:
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            return 0, b""
+
+    def _random_document_id(self):
+        with self._lock:
+            return random.choice(self.document_ids) if self.document_ids else None
+
+    def run_operation(self, op, scheduled_at=None):
+        """
+        Menjalankan satu request. Jika scheduled_at (waktu perf_counter jadwal request, mode --rate) diberikan,
+        latensi diukur dari jadwal tersebut agar keterlambatan pengiriman ikut terhitung (tanpa coordinated omission);
+        keterlambatan pengiriman juga dicatat terpisah.
+        """
+        if op == "upload":
+            if random.random() < self.new_signer_ratio:
+                user_id = f"load_{uuid.uuid4().hex[:12]}" # Penanda tangan baru, memicu pembuatan kunci
+            else:
+                user_id = str(random.randint(1, 10))
+            body, content_type = _multipart_body({"user_id": user_id}, "file", "load-test.bin", self.file_data)
+            start = time.perf_counter()
+            status, payload = self._request(self.base_url + "/upload_and_sign", body, content_type)
+            finished = time.perf_counter()
+            if status == 201:
+                with self._lock:
+                    self.document_ids.append(json.loads(payload)["document_id"])
+        else:
+            doc_id = self._random_document_id()
+            if doc_id is None:
+                return
+            path = {
+                "info": f"/get_signature_info?document_id={doc_id}",
+                "qrcode": f"/get_qrcode/{doc_id}",
+                "download": f"/download_original_file/{doc_id}",
+            }[op]
+            start = time.perf_counter()
+            status, _ = self._request(self.base_url + path)
+            finished = time.perf_counter()
+
+        origin = start if scheduled_at is None else scheduled_at
+        with self._lock:
+            result = self.results[op]
+            result["latencies"].append(finished - origin)
+            result["send_delays"].append(max(0.0, start - origin))
+            result["status"][status] = result["status"].get(status, 0) + 1
+            if status == 0 or status >= 400:
+                result["errors"] += 1
+
+def _empty_results():
+    return {op: {"latencies": [], "send_delays": [], "errors": 0, "status": {}} for op in OPERATIONS}
+
+def run_load(base_url, weights, duration, concurrency, rate, file_size_kb, seed_docs, new_signer_ratio):
+    """
+    Menjalankan campuran request selama 'duration' detik.
+    Jika rate diberikan, request dijadwalkan pada laju tetap (request/detik, open-loop);
+    jika tidak, setiap klien langsung mengirim request berikutnya (closed-loop).
+    Pada mode open-loop latensi diukur dari jadwal request, bukan dari saat request benar-benar dikirim.
+    """
+    client = LoadClient(base_url, file_size_kb, new_signer_ratio)
+    for _ in range(seed_docs):
+        client.run_operation("upload")
+    client.results = _empty_results()
+
+    ops = list(weights)
+    op_weights = [weights[op] for op in ops]
+    start = time.perf_counter()
+    end = start + duration
+    schedule_lock = threading.Lock()
+    next_slot = [start]
+
+    def worker():
+        while True:
+            if rate:
+                with schedule_lock:
+                    slot = next_slot[0]
+                    next_slot[0] += 1.0 / rate
+                if slot >= end:
+                    return
+                delay = slot - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                client.run_operation(random.choices(ops, op_weights)[0], scheduled_at=slot)
+                continue
+            if time.perf_counter() >= end:
+                return
+            client.run_operation(random.choices(ops, op_weights)[0])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    elapsed = time.perf_counter() - start
+    return client.results, elapsed
+
+def summarize(results, elapsed, lock_count):
+    """
+    Menghitung throughput, persentil latensi, dan tingkat error per operasi.
+    """
+    summary = {"elapsed_s": elapsed, "lock_errors": lock_count, "operations": {}}
+    total_requests = 0
+    total_errors = 0
+    for op, result in results.items():
+        latencies = sorted(result["latencies"])
+        send_delays = sorted(result["send_delays"])
+        if not latencies:
+            continue
+        count = len(latencies)
+        total_requests += count
+        total_errors += result["errors"]
+        summary["operations"][op] = {
+            "requests": count,
+            "throughput_rps": count / elapsed,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p90_ms": percentile(latencies, 90) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": latencies[-1] * 1000,
+            "send_delay_p99_ms": percentile(send_delays, 99) * 1000, # Keterlambatan kirim dari jadwal (mode --rate)
+            "error_rate": result["errors"] / count,
+            "status": result["status"],
+        }
+    summary["requests"] = total_requests
+    summary["throughput_rps"] = total_requests / elapsed if elapsed else 0.0
+    summary["error_rate"] = total_errors / total_requests if total_requests else 0.0
+    summary["lock_rate"] = lock_count / total_requests if total_requests else 0.0
+    return summary
+
+def print_summary(workers, summary):
+    print(f"\n=== Workers: {workers} | {summary['requests']} request dalam {summary['elapsed_s']:.1f}s | "
+          f"{summary['throughput_rps']:.1f} req/s | error {summary['error_rate']:.2%} | lock {summary['lock_rate']:.2%} ===")
+    print(f"{'Operasi':<10} {'req':>7} {'req/s':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'error':>7} {'delay p99':>10}")
+    for op, stats in summary["operations"].items():
+        print(f"{op:<10} {stats['requests']:>7} {stats['throughput_rps']:>8.1f} {stats['p50_ms']:>9.1f} {stats['p90_ms']:>9.1f} "
+              f"{stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f} {stats['error_rate']:>7.2%} {stats['send_delay_p99_ms']:>10.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test end-to-end untuk Digital Signature Service.")
+    parser.add_argument("--workers", default="1,2,4", help="Daftar jumlah proses server yang diuji, misal '1,2,4' (0 = satu proses multi-thread).")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Bobot request per operasi ({', '.join(OPERATIONS)}).")
+    parser.add_argument("--duration", type=int, default=DEFAULT_DURATION, help="Durasi pengukuran per jumlah worker (detik).")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Jumlah klien bersamaan.")
+    parser.add_argument("--rate", type=float, default=None, help="Target laju request/detik (open-loop). Default: closed-loop.")
+    parser.add_argument("--file-size-kb", type=int, default=DEFAULT_FILE_SIZE_KB, help="Ukuran file upload (KB).")
+    parser.add_argument("--seed-docs", type=int, default=DEFAULT_SEED_DOCS, help="Jumlah dokumen yang diunggah sebelum pengukuran.")
+    parser.add_argument("--new-signer-ratio", type=float, default=DEFAULT_NEW_SIGNER_RATIO, help="Porsi upload dari penanda tangan baru.")
+    parser.add_argument("--json", dest="json_path", help="Simpan hasil lengkap ke file JSON.")
+    parser.add_argument("--keep-workdir", action="store_true", help="Jangan hapus direktori kerja sementara (database, file, log).")
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    all_results = {}
+    for workers in [int(w) for w in args.workers.split(",")]:
+        workdir = tempfile.mkdtemp(prefix="dsig-loadtest-")
+        log_path = os.path.join(workdir, "server.log")
+        process, log_file, base_url = start_server(workdir, _free_port(), workers, log_path)
+        try:
+            results, elapsed = run_load(base_url, weights, args.duration, args.concurrency, args.rate,
+                                        args.file_size_kb, args.seed_docs, args.new_signer_ratio)
+        finally:
+            stop_server(process, log_file)
+
+        with open(log_path, errors="replace") as f:
+            lock_count = f.read().count(LOCK_MARKER)
+        summary = summarize(results, elapsed, lock_count)
+        print_summary(workers, summary)
+        all_results[workers] = summary
+
+        if args.keep_workdir:
+            print(f"Direktori kerja: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if len(all_results) > 1:
+        baseline_workers = next(iter(all_results))
+        baseline = all_results[baseline_workers]["throughput_rps"] or 1.0
+        print("\n=== Skalabilitas ===")
+        print(f"{'Workers':>8} {'req/s':>9} {'speedup':>8} {'p99 ms':>9} {'error':>7} {'lock':>7}")
+        for workers, summary in all_results.items():
+            p99 = max((s["p99_ms"] for s in summary["operations"].values()), default=0.0)
+            print(f"{workers:>8} {summary['throughput_rps']:>9.1f} {summary['throughput_rps'] / baseline:>8.2f} "
+                  f"{p99:>9.1f} {summary['error_rate']:>7.2%} {summary['lock_rate']:>7.2%}")
+        print("Catatan: werkzeug processes=N melakukan fork satu proses per request (bukan pool pre-fork), "
+              "sehingga biaya fork ikut terukur dan speedup lebih rendah dari server pre-fork seperti gunicorn.")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(all_results, f, indent=2)
+        print(f"\nHasil disimpan di {args.json_path}")
@@ -0,0 +1,263 @@
+import atexit
+import contextvars
+import copy
+import itertools
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# --- Konfigurasi logging ---
+LOG_LEVEL = 'INFO'               # Level default untuk semua modul
+# Level per modul (nama logger = nama modul), misal {'scrubber': 'WARNING', 'generate': 'DEBUG'}
+LOG_MODULE_LEVELS = {}
+LOG_FILE = None                  # None = tulis ke stdout; isi path untuk menulis ke file
+LOG_QUEUE_SIZE = 10000           # Kapasitas antrian antara thread pemanggil dan thread penulis log
+# Jika antrian sudah terisi melebihi fraksi ini, record DEBUG hanya diambil 1 dari LOG_DEBUG_SAMPLE_EVERY
+LOG_BACKPRESSURE_THRESHOLD = 0.5
+LOG_DEBUG_SAMPLE_EVERY = 10
+LOG_DROP_REPORT_INTERVAL = 1.0  # Jarak minimal (detik) antar laporan jumlah record yang dibuang
+# --- Akhir konfigurasi ---
+
+# Konteks per request/thread: ID request dan akumulasi durasi setiap tahap (ms)
+_request_id = contextvars.ContextVar('request_id', default=None)
+_request_stages = contextvars.ContextVar('request_stages', default=None)
+
+_setup_lock = threading.Lock()
+_listener = None
+_handler = None
+_log_target = None # (log_file, queue_size) yang dipakai saat setup, untuk membangun ulang listener setelah fork
+_forked_child = False
+
+# Atribut bawaan LogRecord yang tidak ikut ditulis sebagai field tambahan
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id'}
+
+class JsonLineFormatter(logging.Formatter):
+    """
+    Memformat record log sebagai satu baris JSON.
+    Field tambahan dapat diberikan lewat argumen extra, misal logger.info("...", extra={'document_id': 1}).
+    """
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler yang tidak pernah menahan thread pemanggil.
+    Saat antrian mulai penuh, record DEBUG di-sampling; saat antrian penuh, record dibuang dan jumlahnya
+    dilaporkan sebagai satu record WARNING begitu antrian kembali tersedia.
+    """
+    def __init__(self, log_queue, backpressure_threshold=LOG_BACKPRESSURE_THRESHOLD, debug_sample_every=LOG_DEBUG_SAMPLE_EVERY):
+        super().__init__(log_queue)
+        self.backpressure_size = max(1, int(log_queue.maxsize * backpressure_threshold)) if log_queue.maxsize > 0 else None
+        self.debug_sample_every = max(1, debug_sample_every)
+        self._debug_counter = itertools.count()
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._next_report = 0.0
+
+    def prepare(self, record):
+        # Dijalankan di thread pemanggil: pesan dan traceback dibentuk di sini (argumen bisa berubah setelahnya)
+        # dan ID request masih tersedia. Pembentukan JSON dan penulisan dilakukan oleh thread listener.
+        record = copy.copy(record)
+        message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = message, None, None
+        if getattr(record, 'request_id', None) is None:
+            record.request_id = _request_id.get()
+        return record
+
+    def enqueue(self, record):
+        if (record.levelno <= logging.DEBUG and self.backpressure_size
+                and self.queue.qsize() >= self.backpressure_size
+                and next(self._debug_counter) % self.debug_sample_every):
+            self._count_dropped()
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._count_dropped()
+            return
+        if self._dropped and time.monotonic() >= self._next_report:
+            self._report_dropped()
+
+    def _count_dropped(self):
+        with self._dropped_lock:
+            self._dropped += 1
+
+    def _report_dropped(self):
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, 0
+            self._next_report = time.monotonic() + LOG_DROP_REPORT_INTERVAL
+        if not dropped:
+            return
+        report = logging.makeLogRecord({
+            'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+            'msg': "%d record log dibuang atau di-sampling karena antrian log penuh.", 'args': (dropped,),
+            'dropped_records': dropped,
+        })
+        try:
+            self.queue.put_nowait(self.prepare(report))
+        except queue.Full:
+            with self._dropped_lock:
+                self._dropped += dropped
+
+def setup_logging(level=None, module_levels=None, log_file=None, queue_size=None):
+    """
+    Memasang handler logging berbasis antrian pada root logger (hanya sekali per proses).
+    Penulisan ke stdout/file dilakukan oleh thread QueueListener, bukan oleh thread request.
+    """
+    global _log_target
+    with _setup_lock:
+        if _listener is not None:
+            return
+        root = logging.getLogger()
+        root.setLevel(level or LOG_LEVEL)
+        for module_name, module_level in (module_levels if module_levels is not None else LOG_MODULE_LEVELS).items():
+            logging.getLogger(module_name).setLevel(module_level)
+
+        _log_target = (log_file or LOG_FILE, queue_size or LOG_QUEUE_SIZE)
+        _start_listener()
+        # Pastikan record yang masih di antrian ditulis sebelum proses berhenti
+        atexit.register(_stop_listener)
+        # Thread listener tidak ikut ter-fork: proses anak (misal werkzeug processes>1 atau server prefork
+        # dengan preload) perlu antrian, handler, dan listener sendiri
+        os.register_at_fork(after_in_child=_restart_after_fork)
+
+def _start_listener():
+    """
+    Membuat antrian, handler di root logger, dan thread QueueListener baru (menggantikan yang lama jika ada).
+    """
+    global _listener, _handler
+    log_file, queue_size = _log_target
+    log_queue = queue.Queue(maxsize=queue_size)
+    target = logging.FileHandler(log_file, encoding='utf-8') if log_file else logging.StreamHandler(sys.stdout)
+    target.setFormatter(JsonLineFormatter())
+
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+    _handler = NonBlockingQueueHandler(log_queue)
+    root.addHandler(_handler)
+    _listener = QueueListener(log_queue, target, respect_handler_level=True)
+    _listener.start()
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+def _restart_after_fork():
+    global _setup_lock, _forked_child
+    # Lock bisa saja sedang dipegang thread lain saat fork terjadi
+    _setup_lock = threading.Lock()
+    if _listener is not None:
+        _forked_child = True
+        _start_listener()
+
+def is_forked_child():
+    """
+    True jika proses ini hasil fork setelah logging dipasang (listener sudah dibangun ulang di proses anak).
+    """
+    return _forked_child
+
+def flush_logs(timeout=1.0):
+    """
+    Menunggu sampai semua record di antrian ditulis oleh listener (maksimal timeout detik).
+    Dipakai sebelum proses berakhir tanpa menjalankan atexit, misal proses anak werkzeug yang keluar lewat os._exit().
+    """
+    if _handler is None:
+        return
+    log_queue = _handler.queue
+    deadline = time.monotonic() + timeout
+    with log_queue.all_tasks_done:
+        while log_queue.unfinished_tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            log_queue.all_tasks_done.wait(remaining)
+
+def get_logger(name):
+    """
+    Mengambil logger untuk sebuah modul, memasang handler antrian jika belum terpasang.
+    """
+    setup_logging()
+    return logging.getLogger(name)
+
+def begin_request(request_id=None):
+    """
+    Menandai awal sebuah request/unit kerja: menetapkan ID request dan mengosongkan catatan durasi tahap.
+    Returns:
+        tuple: (request_id, token); token diberikan ke end_request().
+    """
+    request_id = request_id or uuid.uuid4().hex
+    token = (_request_id.set(request_id), _request_stages.set({}))
+    return request_id, token
+
+def end_request(token):
+    """
+    Menandai akhir request dan mengembalikan durasi setiap tahap (ms) yang tercatat selama request.
+    """
+    stages = _request_stages.get() or {}
+    id_token, stages_token = token
+    _request_stages.reset(stages_token)
+    _request_id.reset(id_token)
+    return stages
+
+def get_request_id():
+    """
+    Mengembalikan ID request yang sedang berjalan, atau None.
+    """
+    return _request_id.get()
+
+@contextmanager
+def log_stage(stage, logger=None, **fields):
+    """
+    Mengukur durasi sebuah tahap, menambahkannya ke catatan request yang sedang berjalan,
+    dan menulis record DEBUG dengan field 'stage' dan 'duration_ms'.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = round((time.perf_counter() - start) * 1000, 3)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[stage] = round(stages.get(stage, 0) + duration_ms, 3)
+        (logger or logging.getLogger(__name__)).debug(
+            "Tahap '%s' selesai dalam %.3f ms", stage, duration_ms,
+            extra={'stage': stage, 'duration_ms': duration_ms, **fields}
+        )
+
+if __name__ == "__main__":
+    # Pemeriksaan sederhana: record ERROR dari proses anak hasil fork harus tetap tertulis ke stdout
+    selftest_logger = get_logger('logger.selftest')
+    selftest_logger.info("Proses induk %d", os.getpid())
+    child_pid = os.fork()
+    if child_pid == 0:
+        selftest_logger.error("Record ERROR dari proses anak %d", os.getpid())
+        flush_logs()
+        os._exit(0) # Keluar tanpa atexit, seperti proses anak werkzeug
+    os.waitpid(child_pid, 0)
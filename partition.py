@@ -0,0 +1,142 @@
+import glob
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from database import DATABASE_NAME, create_documents_table
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# --- Konfigurasi partisi database dokumen ---
+# None     : semua dokumen disimpan di DATABASE_NAME (perilaku lama)
+# 'signer' : dokumen dibagi ke PARTITION_COUNT file berdasarkan hash signer_user_id
+# 'month'  : satu file per bulan (UTC) berdasarkan waktu penandatanganan; nomor partisi = jumlah bulan sejak
+#            Januari 2000 (Januari 2000 = 1, Oktober 2026 = 322)
+# Tabel keys, user_profiles, signing_jobs, dan scrub_checkpoints tetap di DATABASE_NAME.
+PARTITION_MODE = None
+PARTITION_COUNT = 4
+PARTITION_QUERY_WORKERS = 8 # Jumlah query paralel untuk fan-out ke semua partisi
+# --- Akhir konfigurasi ---
+
+# ID dokumen global = partisi * PARTITION_ID_MULTIPLIER + ID lokal di file partisi.
+# Partisi 0 adalah DATABASE_NAME, sehingga ID dokumen lama tidak berubah.
+# ID global harus tetap di bawah 2^53 agar tidak dibulatkan oleh klien JSON/JavaScript, sehingga
+# setiap partisi menampung maksimal PARTITION_ID_MULTIPLIER - 1 (999.999.999) dokumen dan
+# nomor partisi maksimal MAX_PARTITION (cukup untuk mode 'month' sampai ratusan ribu tahun).
+PARTITION_ID_MULTIPLIER = 10 ** 9
+MAX_DOCUMENT_ID = 2 ** 53 - 1
+MAX_PARTITION = MAX_DOCUMENT_ID // PARTITION_ID_MULTIPLIER - 1
+MAIN_PARTITION = 0
+
+_initialized_partitions = set()
+_initialized_lock = threading.Lock()
+
+def encode_document_id(partition, local_id):
+    """
+    Menggabungkan nomor partisi dan ID lokal menjadi ID dokumen global.
+    Raises:
+        ValueError: Jika ID lokal atau nomor partisi melebihi batas sehingga ID global tidak aman untuk JSON.
+    """
+    if not 0 <= partition <= MAX_PARTITION or local_id >= PARTITION_ID_MULTIPLIER:
+        raise ValueError(f"ID lokal {local_id} di partisi {partition} melebihi batas ID dokumen.")
+    return partition * PARTITION_ID_MULTIPLIER + local_id
+
+def decode_document_id(document_id):
+    """
+    Memisahkan ID dokumen global menjadi (partisi, ID lokal).
+    """
+    return divmod(int(document_id), PARTITION_ID_MULTIPLIER)
+
+def partition_for_new_document(signer_user_id):
+    """
+    Menentukan partisi untuk dokumen baru sesuai PARTITION_MODE.
+    Returns:
+        int: Nomor partisi (0 jika partisi tidak aktif).
+    """
+    if PARTITION_MODE == 'signer':
+        digest = hashlib.sha256(str(signer_user_id).encode('utf-8')).hexdigest()
+        return 1 + int(digest[:8], 16) % PARTITION_COUNT
+    if PARTITION_MODE == 'month':
+        now = time.gmtime()
+        return (now.tm_year - 2000) * 12 + now.tm_mon
+    return MAIN_PARTITION
+
+def partition_database_name(partition):
+    """
+    Mengembalikan nama file database untuk nomor partisi tertentu.
+    """
+    if partition == MAIN_PARTITION:
+        return DATABASE_NAME
+    base, ext = os.path.splitext(DATABASE_NAME)
+    return f"{base}_p{partition}{ext}"
+
+def list_partitions():
+    """
+    Mengembalikan semua nomor partisi yang ada (partisi utama selalu disertakan).
+    """
+    base, ext = os.path.splitext(DATABASE_NAME)
+    partitions = [MAIN_PARTITION]
+    for path in sorted(glob.glob(f"{glob.escape(base)}_p*{ext}")):
+        suffix = path[len(base) + 2:len(path) - len(ext)]
+        if suffix.isdigit():
+            partitions.append(int(suffix))
+    return partitions
+
+def connect_partition(partition):
+    """
+    Membuka koneksi ke database partisi, membuat tabel documents jika file partisi baru.
+    """
+    conn = sqlite3.connect(partition_database_name(partition))
+    if partition != MAIN_PARTITION and partition not in _initialized_partitions:
+        with _initialized_lock:
+            if partition not in _initialized_partitions:
+                create_documents_table(conn.cursor())
+                conn.commit()
+                _initialized_partitions.add(partition)
+    return conn
+
+def query_partition(partition, sql, params=()):
+    """
+    Menjalankan query SELECT pada satu partisi.
+    Kolom 'id' pada hasil diubah menjadi ID dokumen global.
+    Returns:
+        list: Daftar baris sebagai dict.
+    """
+    # Jangan membuat file partisi baru hanya karena ada pencarian ID yang tidak dikenal
+    if partition != MAIN_PARTITION and not os.path.exists(partition_database_name(partition)):
+        return []
+
+    conn = None
+    try:
+        conn = connect_partition(partition)
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        columns = [description[0] for description in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for row in rows:
+            if 'id' in row:
+                row['id'] = encode_document_id(partition, row['id'])
+        return rows
+    except sqlite3.Error as e:
+        logger.error("Error saat query partisi %s: %s", partition, e)
+        return []
+    finally:
+        if conn:
+            conn.close()
+
+def query_all_partitions(sql, params=()):
+    """
+    Menjalankan query SELECT yang sama di semua partisi secara paralel (fan-out).
+    Returns:
+        list: Gabungan baris dari semua partisi (dict, dengan 'id' global).
+    """
+    partitions = list_partitions()
+    if len(partitions) == 1:
+        return query_partition(partitions[0], sql, params)
+    with ThreadPoolExecutor(max_workers=min(PARTITION_QUERY_WORKERS, len(partitions))) as executor:
+        results = executor.map(lambda partition: query_partition(partition, sql, params), partitions)
+    return [row for rows in results for row in rows]
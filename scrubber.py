@@ -0,0 +1,265 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.backends import default_backend
+
+from database import DATABASE_NAME
+from generate import calculate_file_hash, verify_digest, verify_document_hash
+from partition import MAIN_PARTITION, connect_partition, encode_document_id, list_partitions
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# --- Konfigurasi default scrubber integritas ---
+SCRUBBER_NAME = 'default'          # Nama checkpoint di tabel scrub_checkpoints
+SCRUBBER_IO_BUDGET_MB_S = 5.0      # Batas total laju baca file (MB/s) untuk semua worker
+SCRUBBER_CONCURRENCY = 2           # Jumlah file yang diperiksa bersamaan
+SCRUBBER_PARTITION_CONCURRENCY = 4 # Jumlah partisi yang dibaca bersamaan (partisi lain menunggu giliran)
+SCRUBBER_BATCH_SIZE = 50           # Jumlah baris documents yang diambil per batch
+SCRUBBER_PASS_INTERVAL = 3600      # Jeda (detik) antar putaran penuh saat berjalan di background
+# --- Akhir konfigurasi ---
+
+# Status hasil pemeriksaan yang disimpan di kolom documents.integrity_status
+STATUS_OK = 'OK'
+STATUS_MISSING = 'MISSING'
+STATUS_HASH_MISMATCH = 'HASH_MISMATCH'
+STATUS_INVALID_SIGNATURE = 'INVALID_SIGNATURE'
+STATUS_ERROR = 'ERROR'
+
+class IORateLimiter:
+    """
+    Pembatas laju I/O (token bucket) yang dipakai bersama oleh semua worker scrubber.
+    Setiap chunk yang dibaca "membayar" sejumlah byte; jika anggaran habis, pemanggil ditahan.
+    """
+    def __init__(self, mb_per_second):
+        self.bytes_per_second = mb_per_second * 1024 * 1024 if mb_per_second and mb_per_second > 0 else None
+        self._lock = threading.Lock()
+        self._next_free = time.monotonic()
+
+    def consume(self, num_bytes):
+        """
+        Mencatat pemakaian num_bytes dan tidur jika laju melebihi anggaran.
+        """
+        if not self.bytes_per_second:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_free)
+            self._next_free = start + num_bytes / self.bytes_per_second
+            delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+def get_checkpoint(name=SCRUBBER_NAME):
+    """
+    Mengambil ID dokumen terakhir yang sudah diperiksa oleh scrubber.
+    """
+    conn = None
+    try:
+        conn = sqlite3.connect(DATABASE_NAME)
+        cursor = conn.cursor()
+        cursor.execute("SELECT last_document_id FROM scrub_checkpoints WHERE name = ?", (name,))
+        result = cursor.fetchone()
+        if result:
+            return result[0]
+        return 0
+    except sqlite3.Error as e:
+        logger.error("Error saat mengambil checkpoint scrubber: %s", e)
+        return 0
+    finally:
+        if conn:
+            conn.close()
+
+def _checkpoint_name(name, partition):
+    """
+    Nama checkpoint per partisi; partisi utama memakai nama scrubber apa adanya.
+    """
+    return name if partition == MAIN_PARTITION else f"{name}:p{partition}"
+
+def _fetch_document_batch(partition, last_document_id, batch_size):
+    """
+    Mengambil batch dokumen berikutnya (ID lokal > last_document_id) dari satu partisi secara berurutan.
+    """
+    conn = None
+    try:
+        conn = connect_partition(partition)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, original_file_path, document_hash, public_key, signature, signature_algorithm, storage_codec, digest_only
+            FROM documents WHERE id > ? ORDER BY id LIMIT ?
+        ''', (last_document_id, batch_size))
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        logger.error("Error saat mengambil batch dokumen untuk scrubber: %s", e)
+        return []
+    finally:
+        if conn:
+            conn.close()
+
+def _save_batch_results(name, partition, results, last_document_id):
+    """
+    Menyimpan status pemeriksaan satu batch lalu memajukan checkpoint.
+    Untuk partisi utama keduanya terjadi dalam satu transaksi; untuk partisi lain status disimpan
+    lebih dulu sehingga jika proses berhenti di antaranya, batch tersebut hanya diperiksa ulang.
+    """
+    conn = None
+    checkpoint_conn = None
+    try:
+        conn = connect_partition(partition)
+        cursor = conn.cursor()
+        cursor.executemany('''
+            UPDATE documents SET integrity_status = ?, last_verified_at = CURRENT_TIMESTAMP WHERE id = ?
+        ''', [(status, doc_id) for doc_id, status in results])
+        if partition == MAIN_PARTITION:
+            checkpoint_cursor = cursor
+        else:
+            conn.commit()
+            checkpoint_conn = sqlite3.connect(DATABASE_NAME)
+            checkpoint_cursor = checkpoint_conn.cursor()
+        checkpoint_cursor.execute('''
+            INSERT OR REPLACE INTO scrub_checkpoints (name, last_document_id, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+        ''', (_checkpoint_name(name, partition), last_document_id))
+        (checkpoint_conn or conn).commit()
+        return True
+    except sqlite3.Error as e:
+        logger.error("Error saat menyimpan hasil scrubber: %s", e)
+        return False
+    finally:
+        if conn:
+            conn.close()
+        if checkpoint_conn:
+            checkpoint_conn.close()
+
+def check_document_integrity(doc_info, rate_limiter=None):
+    """
+    Menghitung ulang hash file dokumen dan memverifikasi tanda tangannya.
+    Args:
+        doc_info (dict): Baris documents (id, original_file_path, document_hash, public_key, signature, signature_algorithm, storage_codec, digest_only).
+        rate_limiter (IORateLimiter, optional): Pembatas laju baca file.
+    Returns:
+        str: Salah satu status STATUS_*.
+    """
+    # Dokumen digest-only tidak memiliki file di storage, cukup periksa tanda tangan atas digest
+    if doc_info['digest_only']:
+        if verify_document_hash(doc_info['document_hash'], doc_info['public_key'], doc_info['signature'], doc_info['signature_algorithm']):
+            return STATUS_OK
+        return STATUS_INVALID_SIGNATURE
+
+    file_path = doc_info['original_file_path']
+    if not os.path.exists(file_path):
+        return STATUS_MISSING
+
+    on_chunk = rate_limiter.consume if rate_limiter else None
+    doc_hash = calculate_file_hash(file_path, "sha256", chunk_size=64 * 1024, on_chunk=on_chunk, storage_codec=doc_info['storage_codec'])
+    if not doc_hash:
+        return STATUS_ERROR
+    if doc_hash != doc_info['document_hash']:
+        return STATUS_HASH_MISMATCH
+
+    try:
+        public_key = serialization.load_pem_public_key(
+            doc_info['public_key'].encode('utf-8'),
+            backend=default_backend()
+        )
+        verify_digest(public_key, bytes.fromhex(doc_info['signature']), bytes.fromhex(doc_hash), doc_info['signature_algorithm'])
+        return STATUS_OK
+    except Exception as e:
+        logger.warning("Tanda tangan dokumen ID lokal %s tidak valid: %r", doc_info['id'], e)
+        return STATUS_INVALID_SIGNATURE
+
+def _scrub_partition(partition, name, rate_limiter, executor, batch_size, stop_event, summary, summary_lock):
+    """
+    Memeriksa semua dokumen dalam satu partisi mulai dari checkpoint partisi tersebut.
+    """
+    checkpoint_name = _checkpoint_name(name, partition)
+    last_document_id = get_checkpoint(checkpoint_name)
+    logger.info("Memulai putaran '%s' dari dokumen ID lokal > %s...", checkpoint_name, last_document_id)
+
+    while not (stop_event and stop_event.is_set()):
+        batch = _fetch_document_batch(partition, last_document_id, batch_size)
+        if not batch:
+            # Putaran selesai, mulai lagi dari awal pada putaran berikutnya
+            _save_batch_results(name, partition, [], 0)
+            break
+
+        statuses = list(executor.map(lambda doc: check_document_integrity(doc, rate_limiter), batch))
+        results = [(doc['id'], status) for doc, status in zip(batch, statuses)]
+        with summary_lock:
+            for doc_id, status in results:
+                summary[status] = summary.get(status, 0) + 1
+                if status != STATUS_OK:
+                    logger.warning("Dokumen ID %s: %s", encode_document_id(partition, doc_id), status,
+                                   extra={'document_id': encode_document_id(partition, doc_id), 'integrity_status': status})
+
+        last_document_id = batch[-1]['id']
+        if not _save_batch_results(name, partition, results, last_document_id):
+            break
+
+def run_scrub_pass(name=SCRUBBER_NAME, io_budget_mb_s=SCRUBBER_IO_BUDGET_MB_S, concurrency=SCRUBBER_CONCURRENCY,
+                   batch_size=SCRUBBER_BATCH_SIZE, stop_event=None):
+    """
+    Memeriksa dokumen mulai dari checkpoint terakhir sampai dokumen terakhir.
+    Jika partisi dokumen aktif, partisi diperiksa secara paralel (maksimal SCRUBBER_PARTITION_CONCURRENCY sekaligus)
+    dengan checkpoint masing-masing; anggaran I/O dan batas concurrency tetap berlaku untuk keseluruhan scrubber.
+    Setelah satu putaran selesai, checkpoint dikembalikan ke 0 untuk putaran berikutnya.
+    Returns:
+        dict: Jumlah dokumen per status yang diperiksa pada putaran ini.
+    """
+    rate_limiter = IORateLimiter(io_budget_mb_s)
+    summary = {}
+    summary_lock = threading.Lock()
+    partitions = list_partitions()
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor, \
+            ThreadPoolExecutor(max_workers=max(1, min(len(partitions), SCRUBBER_PARTITION_CONCURRENCY))) as partition_executor:
+        futures = [
+            partition_executor.submit(_scrub_partition, partition, name, rate_limiter, executor,
+                                      batch_size, stop_event, summary, summary_lock)
+            for partition in partitions
+        ]
+        for future in futures:
+            future.result()
+    logger.info("Putaran '%s' selesai: %s", name, summary, extra={'summary': summary})
+    return summary
+
+def start_scrubber_thread(pass_interval=SCRUBBER_PASS_INTERVAL, **scrub_options):
+    """
+    Menjalankan scrubber di thread background (daemon) secara berulang.
+    Returns:
+        tuple: (thread, stop_event). Panggil stop_event.set() untuk menghentikan scrubber.
+    """
+    stop_event = threading.Event()
+
+    def _loop():
+        while not stop_event.is_set():
+            run_scrub_pass(stop_event=stop_event, **scrub_options)
+            stop_event.wait(pass_interval)
+
+    thread = threading.Thread(target=_loop, name="integrity-scrubber", daemon=True)
+    thread.start()
+    return thread, stop_event
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrubber integritas untuk file dokumen yang tersimpan.")
+    parser.add_argument("--name", default=SCRUBBER_NAME, help="Nama checkpoint scrubber.")
+    parser.add_argument("--io-budget", type=float, default=SCRUBBER_IO_BUDGET_MB_S, help="Batas laju baca file dalam MB/s (0 = tanpa batas).")
+    parser.add_argument("--concurrency", type=int, default=SCRUBBER_CONCURRENCY, help="Jumlah file yang diperiksa bersamaan.")
+    parser.add_argument("--batch-size", type=int, default=SCRUBBER_BATCH_SIZE, help="Jumlah dokumen per batch.")
+    parser.add_argument("--loop", action="store_true", help="Jalankan terus-menerus dengan jeda --interval detik antar putaran.")
+    parser.add_argument("--interval", type=int, default=SCRUBBER_PASS_INTERVAL, help="Jeda antar putaran (detik) untuk --loop.")
+    args = parser.parse_args()
+
+    from database import initialize_database
+    initialize_database()
+    while True:
+        run_scrub_pass(args.name, args.io_budget, args.concurrency, args.batch_size)
+        if not args.loop:
+            break
+        time.sleep(args.interval)
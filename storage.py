@@ -0,0 +1,377 @@
+import argparse
+import hashlib
+import io
+import lzma
+import os
+import sqlite3
+import zlib
+
+from database import DATABASE_NAME
+from logger import get_logger
+from partition import connect_partition, encode_document_id, list_partitions
+
+logger = get_logger(__name__)
+
+# --- Codec kompresi untuk file di storage ---
+# Nilai kolom documents.storage_codec: None (file disimpan apa adanya), 'gzip', 'lzma', atau 'zlib'.
+# File terkompresi disimpan dengan akhiran sesuai codec agar mudah dikenali di disk.
+STORAGE_CODECS = {
+    'gzip': '.gz',
+    'lzma': '.xz',
+    'zlib': '.zz',
+}
+STORAGE_CHUNK_SIZE = 64 * 1024 # Ukuran chunk (byte) untuk baca/tulis streaming
+# --- Akhir codec ---
+
+# --- Layout direktori fan-out ---
+# File disebar ke subdirektori berdasarkan prefix hex dari SHA256 nama file,
+# misal uploaded_files/3f/a2/<uuid>_<nama>. Dengan 2 level terdapat 65536 direktori,
+# sehingga setiap direktori tetap kecil walaupun jumlah file mencapai jutaan.
+STORAGE_FANOUT_LEVELS = 2
+# --- Akhir layout ---
+
+def sharded_path(base_dir, filename, levels=STORAGE_FANOUT_LEVELS, create_dirs=True):
+    """
+    Mengembalikan path file di dalam layout fan-out base_dir/<xx>/<yy>/filename.
+    Args:
+        base_dir (str): Direktori dasar (misal STORAGE_DIR atau PRIVATE_KEYS_DIR).
+        filename (str): Nama file.
+        levels (int): Jumlah level direktori prefix (0 = layout datar).
+        create_dirs (bool): Buat subdirektori jika belum ada.
+    Returns:
+        str: Path lengkap file.
+    """
+    digest = hashlib.sha256(filename.encode('utf-8')).hexdigest()
+    directory = os.path.join(base_dir, *[digest[i * 2:i * 2 + 2] for i in range(levels)])
+    if create_dirs and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
+def _create_compressor(codec):
+    """
+    Membuat objek compressor streaming untuk codec tertentu.
+    """
+    if codec == 'gzip':
+        return zlib.compressobj(6, zlib.DEFLATED, 31) # wbits=31 menghasilkan format gzip
+    if codec == 'lzma':
+        return lzma.LZMACompressor()
+    if codec == 'zlib':
+        return zlib.compressobj(6)
+    raise ValueError(f"Codec storage '{codec}' tidak didukung. Pilihan: {', '.join(STORAGE_CODECS)}")
+
+def _iter_decompressed_chunks(f, codec, chunk_size):
+    """
+    Membaca file terkompresi dan menghasilkan potongan data asli (maksimal chunk_size per potongan).
+    Raises:
+        EOFError: Jika file berakhir sebelum akhir stream kompresi (file terpotong).
+    """
+    if codec == 'lzma':
+        decompressor = lzma.LZMADecompressor()
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            yield decompressor.decompress(chunk, chunk_size)
+            while not decompressor.needs_input and not decompressor.eof:
+                yield decompressor.decompress(b'', chunk_size)
+        if not decompressor.eof:
+            raise EOFError(f"File terkompresi ({codec}) terpotong: akhir stream tidak ditemukan.")
+        return
+
+    if codec == 'gzip':
+        decompressor = zlib.decompressobj(31)
+    elif codec == 'zlib':
+        decompressor = zlib.decompressobj()
+    else:
+        raise ValueError(f"Codec storage '{codec}' tidak didukung. Pilihan: {', '.join(STORAGE_CODECS)}")
+    for chunk in iter(lambda: f.read(chunk_size), b''):
+        data = chunk
+        while data:
+            yield decompressor.decompress(data, chunk_size)
+            data = decompressor.unconsumed_tail
+    yield decompressor.flush()
+    if not decompressor.eof:
+        raise EOFError(f"File terkompresi ({codec}) terpotong: akhir stream tidak ditemukan.")
+
+class _DecompressingReader(io.RawIOBase):
+    """
+    File-like (read-only) yang mendekompresi file di storage secara streaming.
+    """
+    def __init__(self, path, codec, chunk_size):
+        self._file = open(path, 'rb')
+        self._chunks = _iter_decompressed_chunks(self._file, codec, chunk_size)
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+def open_stored_file(path, codec=None, chunk_size=STORAGE_CHUNK_SIZE):
+    """
+    Membuka file di storage untuk dibaca sebagai byte asli (sudah didekompresi jika perlu).
+    Args:
+        path (str): Path file di storage.
+        codec (str, optional): Codec file (nilai documents.storage_codec), None jika tidak terkompresi.
+    Returns:
+        file-like: Objek file biner yang bisa dibaca secara streaming.
+    """
+    if not codec:
+        return open(path, 'rb')
+    return io.BufferedReader(_DecompressingReader(path, codec, chunk_size), buffer_size=chunk_size)
+
+def stored_path_for(path, codec):
+    """
+    Mengembalikan path file di storage untuk codec tertentu (menambahkan akhiran codec).
+    """
+    if not codec:
+        return path
+    return path + STORAGE_CODECS[codec]
+
+def write_stored_file(source, dest_path, codec=None, raw_fallback=True, chunk_size=STORAGE_CHUNK_SIZE):
+    """
+    Menulis data dari source (file-like biner yang bisa di-seek) ke storage secara streaming.
+    Jika codec diberikan, data dikompresi saat ditulis. Jika hasil kompresi tidak lebih kecil
+    dari data asli, file terkompresi dibuang dan data asli disimpan apa adanya (jika raw_fallback=True).
+    Args:
+        source: File-like biner sumber data (harus mendukung seek untuk raw_fallback).
+        dest_path (str): Path tujuan tanpa akhiran codec.
+        codec (str, optional): 'gzip', 'lzma', 'zlib', atau None.
+        raw_fallback (bool): Simpan data asli jika kompresi tidak menghemat ruang.
+    Returns:
+        tuple: (path_tersimpan, codec_yang_dipakai). (None, None) jika kompresi tidak menghemat
+        dan raw_fallback=False.
+    """
+    if codec:
+        compressed_path = stored_path_for(dest_path, codec)
+        tmp_path = compressed_path + '.tmp'
+        compressor = _create_compressor(codec)
+        raw_size = 0
+        try:
+            with open(tmp_path, 'wb') as out:
+                for chunk in iter(lambda: source.read(chunk_size), b''):
+                    raw_size += len(chunk)
+                    out.write(compressor.compress(chunk))
+                out.write(compressor.flush())
+            if os.path.getsize(tmp_path) < raw_size:
+                os.replace(tmp_path, compressed_path)
+                return compressed_path, codec
+            os.remove(tmp_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # Kompresi tidak menghemat ruang, simpan apa adanya
+        if not raw_fallback:
+            return None, None
+        source.seek(0)
+
+    with open(dest_path, 'wb') as out:
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            out.write(chunk)
+    return dest_path, None
+
+def convert_existing_files(codec, batch_size=100):
+    """
+    Mengompresi file dokumen yang sudah ada di storage (storage_codec NULL) dengan codec tertentu, di semua partisi.
+    Hash data asli diperiksa ulang setelah kompresi sebelum file lama dihapus, sehingga tanda tangan tetap valid.
+    Returns:
+        dict: Jumlah file yang 'converted', 'skipped' (tidak menghemat), dan 'failed'.
+    """
+    # Import di sini untuk menghindari import melingkar (generate.py memakai modul ini)
+    from generate import calculate_file_hash
+
+    summary = {'converted': 0, 'skipped': 0, 'failed': 0}
+    for partition in list_partitions():
+        last_document_id = 0
+        conn = None
+        try:
+            conn = connect_partition(partition)
+            cursor = conn.cursor()
+            while True:
+                cursor.execute('''
+                    SELECT id, original_file_path, document_hash FROM documents
+                    WHERE id > ? AND storage_codec IS NULL AND digest_only = 0 ORDER BY id LIMIT ?
+                ''', (last_document_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+
+                for doc_id, file_path, document_hash in rows:
+                    last_document_id = doc_id
+                    if not os.path.exists(file_path):
+                        logger.warning("File dokumen ID %s tidak ditemukan di '%s', dilewati.", encode_document_id(partition, doc_id), file_path)
+                        summary['failed'] += 1
+                        continue
+                    try:
+                        with open(file_path, 'rb') as source:
+                            new_path, used_codec = write_stored_file(source, file_path, codec, raw_fallback=False)
+                    except Exception as e:
+                        logger.error("Gagal mengompresi dokumen ID %s: %s", encode_document_id(partition, doc_id), e)
+                        summary['failed'] += 1
+                        continue
+                    if not new_path:
+                        summary['skipped'] += 1
+                        continue
+
+                    if calculate_file_hash(new_path, "sha256", storage_codec=used_codec) != document_hash:
+                        logger.error("Hash dokumen ID %s berubah setelah kompresi, file asli dipertahankan.", encode_document_id(partition, doc_id))
+                        os.remove(new_path)
+                        summary['failed'] += 1
+                        continue
+
+                    cursor.execute("UPDATE documents SET original_file_path = ?, storage_codec = ? WHERE id = ?",
+                                   (new_path, used_codec, doc_id))
+                    conn.commit()
+                    os.remove(file_path)
+                    summary['converted'] += 1
+        except sqlite3.Error as e:
+            logger.error("Error saat mengonversi file storage: %s", e)
+        finally:
+            if conn:
+                conn.close()
+    logger.info("Konversi storage ke '%s' selesai: %s", codec, summary, extra={'summary': summary})
+    return summary
+
+def _link_or_copy(src, dst):
+    """
+    Membuat salinan file di lokasi baru tanpa menghapus yang lama (hard link jika bisa).
+    """
+    if os.path.exists(dst):
+        return
+    try:
+        os.link(src, dst)
+    except OSError:
+        tmp_path = dst + '.tmp'
+        with open(src, 'rb') as source, open(tmp_path, 'wb') as out:
+            for chunk in iter(lambda: source.read(STORAGE_CHUNK_SIZE), b''):
+                out.write(chunk)
+        os.replace(tmp_path, dst)
+
+def _migrate_table_paths(cursor, conn, select_sql, update_sql, target_for, batch_size):
+    """
+    Memindahkan file yang dirujuk sebuah tabel ke layout fan-out secara bertahap.
+    File baru dibuat terlebih dahulu, lalu path di database diperbarui dalam satu transaksi per batch,
+    baru kemudian file lama dihapus. Pembaca yang masih memakai path lama tetap menemukan file selama migrasi.
+    Returns:
+        dict: Jumlah file 'moved', 'skipped' (sudah di lokasi baru), dan 'failed'.
+    """
+    summary = {'moved': 0, 'skipped': 0, 'failed': 0}
+    last_row_id = 0
+    while True:
+        cursor.execute(select_sql, (last_row_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for row in rows:
+            row_id, old_path = row[0], row[1]
+            last_row_id = row_id
+            new_path = target_for(row)
+            if old_path == new_path:
+                summary['skipped'] += 1
+                continue
+            if not os.path.exists(old_path):
+                logger.warning("File '%s' (ID %s) tidak ditemukan, dilewati.", old_path, row_id)
+                summary['failed'] += 1
+                continue
+            try:
+                _link_or_copy(old_path, new_path)
+                updates.append((new_path, row_id, old_path))
+            except OSError as e:
+                logger.error("Gagal memindahkan '%s': %s", old_path, e)
+                summary['failed'] += 1
+
+        if updates:
+            cursor.executemany(update_sql, [(new_path, row_id) for new_path, row_id, _ in updates])
+            conn.commit()
+            for _, _, old_path in updates:
+                try:
+                    os.remove(old_path)
+                except OSError as e:
+                    # Path di database sudah diperbarui; file lama mungkin sudah dihapus proses lain
+                    logger.warning("Gagal menghapus file lama '%s': %s", old_path, e)
+            summary['moved'] += len(updates)
+    return summary
+
+def migrate_to_sharded_layout(batch_size=500):
+    """
+    Memindahkan file dokumen (STORAGE_DIR) dan file kunci privat (PRIVATE_KEYS_DIR) dari layout datar
+    ke layout fan-out, sambil memperbarui documents.original_file_path (di semua partisi) dan keys.private_key_path per batch.
+    Aman dijalankan saat aplikasi berjalan dan dapat diulang (file yang sudah pindah dilewati).
+    Returns:
+        dict: Ringkasan untuk 'documents' dan 'keys'.
+    """
+    # Import di sini untuk menghindari import melingkar (generate.py dan key.py memakai modul ini)
+    from generate import STORAGE_DIR
+    from key import PRIVATE_KEYS_DIR
+
+    summary = {'documents': {'moved': 0, 'skipped': 0, 'failed': 0}}
+    for partition in list_partitions():
+        conn = None
+        try:
+            conn = connect_partition(partition)
+            cursor = conn.cursor()
+            partition_summary = _migrate_table_paths(
+                cursor, conn,
+                "SELECT id, original_file_path, filename, storage_codec FROM documents WHERE id > ? AND digest_only = 0 ORDER BY id LIMIT ?",
+                "UPDATE documents SET original_file_path = ? WHERE id = ?",
+                lambda row: stored_path_for(sharded_path(STORAGE_DIR, row[2]), row[3]),
+                batch_size
+            )
+            for key, count in partition_summary.items():
+                summary['documents'][key] += count
+        except sqlite3.Error as e:
+            logger.error("Error saat migrasi layout storage partisi %s: %s", partition, e)
+        finally:
+            if conn:
+                conn.close()
+
+    conn = None
+    try:
+        conn = sqlite3.connect(DATABASE_NAME)
+        cursor = conn.cursor()
+        summary['keys'] = _migrate_table_paths(
+            cursor, conn,
+            "SELECT id, private_key_path FROM keys WHERE id > ? ORDER BY id LIMIT ?",
+            "UPDATE keys SET private_key_path = ? WHERE id = ?",
+            lambda row: sharded_path(PRIVATE_KEYS_DIR, os.path.basename(row[1])),
+            batch_size
+        )
+    except sqlite3.Error as e:
+        logger.error("Error saat migrasi layout storage: %s", e)
+    finally:
+        if conn:
+            conn.close()
+    logger.info("Migrasi layout fan-out selesai: %s", summary, extra={'summary': summary})
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Alat pemeliharaan storage dokumen dan kunci privat.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compress_parser = subparsers.add_parser("compress", help="Mengompresi file dokumen yang sudah ada di storage.")
+    compress_parser.add_argument("codec", choices=list(STORAGE_CODECS), help="Codec kompresi yang dipakai.")
+    compress_parser.add_argument("--batch-size", type=int, default=100, help="Jumlah dokumen per batch.")
+    shard_parser = subparsers.add_parser("shard", help="Memindahkan file ke layout direktori fan-out.")
+    shard_parser.add_argument("--batch-size", type=int, default=500, help="Jumlah baris per batch.")
+    args = parser.parse_args()
+
+    from database import initialize_database
+    initialize_database()
+    if args.command == "compress":
+        convert_existing_files(args.codec, args.batch_size)
+    elif args.command == "shard":
+        migrate_to_sharded_layout(args.batch_size)